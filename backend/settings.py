@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 from decouple import config
 import dj_database_url
@@ -50,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'inventory.querybudget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -115,7 +117,7 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',),
+    'DEFAULT_AUTHENTICATION_CLASSES': ('inventory.authentication.CachedJWTAuthentication',),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
 }
@@ -129,6 +131,131 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Product changes reach websocket clients after their transaction commits,
+# coalesced over this many seconds and sent in frames of up to this many
+# products (inventory/broadcast.py).
+PRODUCT_BROADCAST_DELAY = config('PRODUCT_BROADCAST_DELAY', default=0.25, cast=float)
+PRODUCT_BROADCAST_BATCH_SIZE = config('PRODUCT_BROADCAST_BATCH_SIZE', default=100, cast=int)
+# Days of product change log kept for reconnecting clients to catch up from
+# (manage.py compact_product_changes); older cursors must reload.
+PRODUCT_CHANGE_RETENTION_DAYS = config('PRODUCT_CHANGE_RETENTION_DAYS', default=7, cast=int)
+
+PRODUCT_CACHE_URL = config('PRODUCT_CACHE_URL', default='')
+PRODUCT_CACHE_TTL = config('PRODUCT_CACHE_TTL', default=300, cast=int)
+# Token users are cached this many seconds (inventory/authentication.py).
+# Changes to a user or their groups drop the entry at once, but without
+# PRODUCT_CACHE_URL only in the process that made the change, so the
+# per-process cache keeps entries for USER_CACHE_LOCAL_TTL seconds only:
+# how long another process may still see the old user. 0 turns it off.
+USER_CACHE_TTL = config('USER_CACHE_TTL', default=60, cast=int)
+USER_CACHE_LOCAL_TTL = config('USER_CACHE_LOCAL_TTL', default=5, cast=int)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'products': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'products',
+        'TIMEOUT': PRODUCT_CACHE_TTL,
+        'OPTIONS': {'MAX_ENTRIES': config('PRODUCT_CACHE_MAX_ENTRIES', default=10000, cast=int)},
+    },
+    'analytics': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'analytics',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    'users': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'users',
+        'TIMEOUT': USER_CACHE_LOCAL_TTL,
+        'OPTIONS': {'MAX_ENTRIES': config('USER_CACHE_MAX_ENTRIES', default=5000, cast=int)},
+    },
+}
+if not USER_CACHE_LOCAL_TTL:
+    CACHES['users'] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+if PRODUCT_CACHE_URL:
+    CACHES['products'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': PRODUCT_CACHE_URL,
+        'TIMEOUT': PRODUCT_CACHE_TTL,
+        'KEY_PREFIX': 'inventory',
+    }
+    # Stale entries are still served while they refresh, so keep them for a day.
+    CACHES['analytics'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': PRODUCT_CACHE_URL,
+        'TIMEOUT': 86400,
+        'KEY_PREFIX': 'inventory',
+    }
+    CACHES['users'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': PRODUCT_CACHE_URL,
+        'TIMEOUT': USER_CACHE_TTL,
+        'KEY_PREFIX': 'inventory',
+    }
+
+# What a product's QR code encodes; {pk} is replaced with the product id.
+PRODUCT_QR_URL = config('PRODUCT_QR_URL', default='http://localhost:3000/products/{pk}')
+# Rendered codes are kept on disk under MEDIA_ROOT/qrcodes and, up to this
+# many, in each process's memory; browsers may reuse one for QR_CODE_MAX_AGE.
+QR_CACHE_MAX_ENTRIES = config('QR_CACHE_MAX_ENTRIES', default=2048, cast=int)
+QR_CODE_MAX_AGE = config('QR_CODE_MAX_AGE', default=30 * 86400, cast=int)
+# Label sheet requests share one pool of this many processes per web
+# process (0 or 1: render in the request) and take at most
+# LABEL_SHEET_MAX_PRODUCTS products. Every web process starts its own
+# pool, so keep this small.
+LABEL_MAX_PROCESSES = config('LABEL_MAX_PROCESSES', default=2, cast=int)
+LABEL_SHEET_MAX_PRODUCTS = config('LABEL_SHEET_MAX_PRODUCTS', default=1000, cast=int)
+
+# Cached analytics are recomputed once their movement watermark moves or
+# they are older than this many seconds; until the background refresh
+# lands, the previous result keeps being served.
+ANALYTICS_CACHE_MAX_AGE = config('ANALYTICS_CACHE_MAX_AGE', default=300, cast=int)
+ANALYTICS_CACHE_BACKGROUND = config('ANALYTICS_CACHE_BACKGROUND', default=True, cast=bool)
+
+# Product forecasts are fitted off the request path, by `manage.py
+# forecast_worker` running as its own process. Turning this on instead refits
+# them on a background thread in every web process as sales commit, where
+# the fits compete with requests for CPU; meant for development only.
+FORECAST_BACKGROUND = config('FORECAST_BACKGROUND', default=False, cast=bool)
+# 'auto' picks the most accurate of the models in inventory/forecasting.py
+# per product on a holdout of recent months; a model name forces that one.
+FORECAST_MODEL = config('FORECAST_MODEL', default='auto')
+# Upper bound on worker processes for batch forecasting (0: one per CPU).
+FORECAST_MAX_PROCESSES = config('FORECAST_MAX_PROCESSES', default=0, cast=int)
+
+# Max queries per URL name; see inventory/querybudget.py and the budget
+# tests in inventory/tests.py. Authentication accounts for two queries (the
+# user and their groups) while the token's user is not cached, ETag
+# validators for one to three. A product's first sale of the day adds two
+# to create its DailySales row.
+QUERY_BUDGETS = {
+    'product-list': 6,
+    'product-detail': 6,
+    # Validating category_id and supplier_id costs a query each.
+    'PATCH product-detail': 11,
+    'PUT product-detail': 11,
+    # One DELETE per table that references products.
+    'DELETE product-detail': 11,
+    # Savepoint, guarded update, movement, sales roll-up, change log, then
+    # the product and its images for the response.
+    'product-adjust-stock': 12,
+    'product-adjust-stock-batch': 12,
+    'category-list': 5,
+    'supplier-list': 4,
+    'stock-movement-list': 4,
+    'dashboard_analytics': 12,
+    'top-products': 7,
+    'current_user': 2,
+}
+QUERY_BUDGET_STRICT = config('QUERY_BUDGET_STRICT', default=sys.argv[1:2] == ['test'], cast=bool)
+
+# Dashboard series: 'numpy' loads the window once and groups in memory
+# (inventory/analytics.py), 'orm' runs one aggregate query per series.
+ANALYTICS_ENGINE = config('ANALYTICS_ENGINE', default='numpy')
+
 ADMIN_CODE = config('ADMIN_CODE', default='admin_default')
 MANAGER_CODE = config('MANAGER_CODE', default='manager_default')
 STAFF_CODE = config('STAFF_CODE', default='staff_default')
@@ -38,6 +38,7 @@ const ProductList = () => {
     const [error, setError] = React.useState('');
     const [modalState, setModalState] = React.useState({ type: null, data: null });
     const [pageTitle, setPageTitle] = React.useState('All Products');
+    const [reloadKey, setReloadKey] = React.useState(0);
     
     const location = useLocation();
     const navigate = useNavigate();
@@ -76,22 +77,91 @@ const ProductList = () => {
                 });
             })
             .catch(error => setError('Could not fetch products.'));
-    }, [location.search, categoryId]);
+    }, [location.search, categoryId, reloadKey]);
+
+    const socketRef = React.useRef(null);
+    const visibleIds = React.useMemo(() => products.map(p => p.id), [products]);
+    const visibleIdsRef = React.useRef(visibleIds);
+
+    // Only the products on this page are pushed to us, not every change in the catalog.
+    const subscribeToVisible = React.useCallback(() => {
+        const socket = socketRef.current;
+        if (socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify({ action: 'set', products: visibleIdsRef.current }));
+        }
+    }, []);
+
+    React.useEffect(() => {
+        visibleIdsRef.current = visibleIds;
+        subscribeToVisible();
+    }, [visibleIds, subscribeToVisible]);
+
+    // Position in the server's change log, from the last update frame. After
+    // a dropped connection we ask for what changed since then instead of
+    // reloading; the server answers resync_required if it is too old.
+    const cursorRef = React.useRef(null);
 
     React.useEffect(() => {
         const token = localStorage.getItem('access_token');
         if (!token) return;
-        const socket = new WebSocket(`wss://inventory-pro-49re.onrender.com/ws/products/?token=${token}`);
-        socket.onmessage = (event) => {
-            const data = JSON.parse(event.data);
-            if (data.type === 'product_update') {
-                setProducts(currentProducts =>
-                    currentProducts.map(p => p.id === data.product.id ? data.product : p)
-                );
-            }
+        let closed = false;
+        let retry = null;
+        let attempts = 0;
+
+        const applyUpdates = (updatedProducts, deletedIds = []) => {
+            const updated = new Map(updatedProducts.map(p => [p.id, p]));
+            const deleted = new Set(deletedIds);
+            setProducts(currentProducts =>
+                currentProducts.filter(p => !deleted.has(p.id)).map(p => updated.get(p.id) || p)
+            );
         };
-        return () => { if (socket.readyState === WebSocket.OPEN) socket.close(); };
-    }, []);
+
+        const connect = () => {
+            const socket = new WebSocket(`wss://inventory-pro-49re.onrender.com/ws/products/?token=${token}`);
+            socketRef.current = socket;
+            socket.onopen = () => {
+                subscribeToVisible();
+                if (attempts > 0) {
+                    if (cursorRef.current !== null) {
+                        socket.send(JSON.stringify({ action: 'sync', cursor: cursorRef.current }));
+                    } else {
+                        setReloadKey(key => key + 1);
+                    }
+                }
+                attempts = 0;
+            };
+            socket.onmessage = (event) => {
+                const data = JSON.parse(event.data);
+                if (data.type === 'product_update') {
+                    applyUpdates([data.product]);
+                } else if (data.type === 'products_update') {
+                    applyUpdates(data.products);
+                    if (data.cursor !== undefined) cursorRef.current = data.cursor;
+                } else if (data.type === 'changes') {
+                    applyUpdates(data.products, data.deleted);
+                    cursorRef.current = data.cursor;
+                    if (data.more) socket.send(JSON.stringify({ action: 'sync', cursor: data.cursor }));
+                } else if (data.type === 'resync_required') {
+                    cursorRef.current = data.cursor;
+                    setReloadKey(key => key + 1);
+                }
+            };
+            socket.onclose = () => {
+                if (closed) return;
+                attempts += 1;
+                retry = setTimeout(connect, Math.min(30000, 1000 * 2 ** (attempts - 1)));
+            };
+        };
+        connect();
+
+        return () => {
+            closed = true;
+            clearTimeout(retry);
+            const socket = socketRef.current;
+            socketRef.current = null;
+            if (socket && socket.readyState === WebSocket.OPEN) socket.close();
+        };
+    }, [subscribeToVisible]);
 
     const handleFilterChange = (e) => {
         setFilters(prevFilters => ({...prevFilters, [e.target.name]: e.target.value }));
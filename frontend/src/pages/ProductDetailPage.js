@@ -119,9 +119,13 @@ const ProductDetailPage = () => {
                 <Card className="mb-4">
                     <Card.Body>
                         <Card.Title>Sales History & Forecast (Monthly)</Card.Title>
-                        <div style={{ height: '250px' }}>
-                            <Line data={chartData} options={{ maintainAspectRatio: false }} />
-                        </div>
+                        {forecastData.status === 'pending' ? (
+                            <p className="text-muted mb-0">The forecast is being computed. Check back shortly.</p>
+                        ) : (
+                            <div style={{ height: '250px' }}>
+                                <Line data={chartData} options={{ maintainAspectRatio: false }} />
+                            </div>
+                        )}
                     </Card.Body>
                 </Card>
             )}
@@ -0,0 +1,166 @@
+# inventory/analytics.py
+
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Product
+
+CENTS = Decimal('0.01')
+
+
+def _money(cents):
+    return Decimal(int(cents)) * CENTS
+
+
+def _codes(labels):
+    """Integer code per label, in order of first appearance, plus the labels."""
+    mapping = {}
+    codes = np.fromiter((mapping.setdefault(label, len(mapping)) for label in labels), dtype=np.int64, count=len(labels))
+    return codes, list(mapping)
+
+
+def _group_sum(codes, values, size):
+    # np.add.at keeps int64 exact where bincount would go through float64.
+    totals = np.zeros(size, dtype=np.int64)
+    np.add.at(totals, codes, values)
+    return totals
+
+
+def _ranked(totals, present=None):
+    # Stable, so ties keep first-appearance order from one run to the next.
+    order = np.argsort(-totals, kind='stable')
+    if present is not None:
+        order = order[present[order]]
+    return order
+
+
+class ProductColumns:
+    """Column arrays for the products in ``queryset``, sorted by id."""
+
+    def __init__(self, queryset):
+        rows = list(queryset.order_by('id').values_list('id', 'name', 'category__name', 'sale_price'))
+        ids, names, categories, prices = zip(*rows) if rows else ([],) * 4
+        self.ids = np.array(ids, dtype=np.int64)
+        self.price_cents = np.array([int(price * 100) for price in prices], dtype=np.int64)
+        self.name_codes, self.names = _codes(names)
+        self.category_codes, self.categories = _codes(categories)
+
+    def positions(self, product_ids):
+        """Row positions for ``product_ids``, and a mask of the ones that exist."""
+        positions = np.searchsorted(self.ids, product_ids)
+        positions = np.minimum(positions, max(len(self.ids) - 1, 0))
+        found = self.ids[positions] == product_ids if len(self.ids) else np.zeros(len(product_ids), dtype=bool)
+        return positions, found
+
+
+def _sales_columns(window):
+    """Day codes, days, product ids and units for every sale row in ``window``."""
+    rows = list(window.rollup.values_list('day', 'product_id', 'units_sold').order_by())
+    rows += [(window.boundary_day, row['product_id'], row['units']) for row in window.boundary_rows]
+    days, product_ids, units = zip(*rows) if rows else ([], [], [])
+    # A window has few distinct days, so coding them through a dict is much
+    # cheaper than converting every date object to datetime64.
+    day_codes, day_labels = _codes(days)
+    return day_codes, day_labels, np.array(product_ids, dtype=np.int64), np.array(units, dtype=np.int64)
+
+
+def _sold_products(window):
+    sold = Product.objects.filter(pk__in=window.rollup.values('product_id').order_by())
+    if window.boundary_rows:
+        sold |= Product.objects.filter(pk__in=[row['product_id'] for row in window.boundary_rows])
+    return sold
+
+
+def _catalog_totals():
+    totals = Product.objects.aggregate(
+        value=Sum(F('quantity') * F('sale_price'), output_field=DecimalField()),
+        products=Count('id'),
+        low_stock=Count('id', filter=Q(quantity__lte=F('reorder_point'))),
+    )
+    return {
+        # Quantized like the per-cent sums below; SQLite sums decimals as floats.
+        'total_inventory_value': Decimal(totals['value'] or 0).quantize(CENTS),
+        'total_products': totals['products'],
+        'low_stock_items': totals['low_stock'],
+    }
+
+
+def dashboard_data(window):
+    """
+    The dashboard payload for a SalesWindow: catalog totals in one aggregate
+    query, then the window's per-day sales rows and the products that sold
+    in it, grouped with vectorized group-bys instead of one query per
+    series. Memory grows with the window, not the catalog. Same keys,
+    ordering and Decimal money values as ``orm_dashboard_data``.
+    """
+    day_codes, days, product_ids, units = _sales_columns(window)
+    products = ProductColumns(_sold_products(window))
+    positions, found = products.positions(product_ids)
+    day_codes, positions, units = day_codes[found], positions[found], units[found]
+    revenue = units * products.price_cents[positions]
+
+    revenue_by_day = _group_sum(day_codes, revenue, len(days))
+    sold_on = np.zeros(len(days), dtype=bool)
+    sold_on[day_codes] = True
+
+    name_codes = products.name_codes[positions]
+    units_by_name = _group_sum(name_codes, units, len(products.names))
+    sold = np.zeros(len(products.names), dtype=bool)
+    sold[name_codes] = True
+
+    category_codes = products.category_codes[positions]
+    revenue_by_category = _group_sum(category_codes, revenue, len(products.categories))
+    in_window = np.zeros(len(products.categories), dtype=bool)
+    in_window[category_codes] = True
+    distinct_products = np.unique(positions)
+    products_by_category = np.bincount(
+        products.category_codes[distinct_products], minlength=len(products.categories)
+    ).astype(np.int64)
+
+    return {
+        **_catalog_totals(),
+        'category_distribution': [
+            {'product__category__name': products.categories[code], 'count': int(products_by_category[code])}
+            for code in _ranked(products_by_category, in_window)
+        ],
+        'sales_trend': [
+            {'day': days[code], 'total_revenue': _money(revenue_by_day[code])}
+            for code in sorted(np.flatnonzero(sold_on), key=days.__getitem__)
+        ],
+        'top_selling_products': [
+            {'product__name': products.names[code], 'units_sold': int(units_by_name[code])}
+            for code in _ranked(units_by_name, sold)[:5]
+        ],
+        'revenue_by_category': [
+            {'product__category__name': products.categories[code], 'total_revenue': _money(revenue_by_category[code])}
+            for code in _ranked(revenue_by_category, in_window)
+        ],
+    }
+
+
+def orm_dashboard_data(window):
+    """The same payload computed with one aggregate query per series."""
+    total_inventory_value = Product.objects.aggregate(total_value=Coalesce(Sum(F('quantity') * F('sale_price'), output_field=DecimalField()), 0, output_field=DecimalField()))['total_value']
+    return {
+        'total_inventory_value': total_inventory_value,
+        'total_products': Product.objects.count(),
+        'low_stock_items': Product.objects.filter(quantity__lte=F('reorder_point')).count(),
+        'category_distribution': window.category_distribution(),
+        'sales_trend': window.sales_trend(),
+        'top_selling_products': window.top_selling_products(),
+        'revenue_by_category': window.revenue_by_category(),
+    }
+
+
+ENGINES = {
+    'numpy': dashboard_data,
+    'orm': orm_dashboard_data,
+}
+
+
+def get_dashboard_data(window):
+    return ENGINES[getattr(settings, 'ANALYTICS_ENGINE', 'numpy')](window)
@@ -0,0 +1,86 @@
+# inventory/broadcast.py
+
+import itertools
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .changes import sync_cursor
+from .models import Product
+from .serializers import ProductSerializer
+from .topics import product_groups
+from .workers import BackgroundWorker
+
+
+class ProductBroadcaster:
+    """
+    Sends product changes to websocket clients off the request path.
+
+    ``queue`` only records product ids. The first id queued starts a window
+    of ``PRODUCT_BROADCAST_DELAY`` seconds on the worker thread; every save
+    of any product in that window joins the same flush, which loads the
+    products once and sends them as ``products_update`` frames of at most
+    ``PRODUCT_BROADCAST_BATCH_SIZE`` products.
+    """
+
+    def __init__(self, name='product-broadcaster'):
+        self._worker = BackgroundWorker(name)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._scheduled = False
+        self._flushes = itertools.count()
+
+    def queue(self, product_ids):
+        with self._lock:
+            self._pending.update(product_ids)
+            if self._scheduled or not self._pending:
+                return
+            self._scheduled = True
+        # A fresh key per window: ids queued while a flush is sending must
+        # start the next window rather than be deduplicated into this one.
+        self._worker.submit(next(self._flushes), self._flush_after_delay)
+
+    def _flush_after_delay(self):
+        time.sleep(getattr(settings, 'PRODUCT_BROADCAST_DELAY', 0.25))
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            product_ids, self._pending = self._pending, set()
+            self._scheduled = False
+        if product_ids:
+            send_products(product_ids)
+
+    def join(self):
+        self._worker.join()
+
+
+def send_products(product_ids):
+    """
+    Serializes each product once and sends it to every group it belongs to,
+    so a client only receives the products it subscribed to. Frames carry
+    the change-log cursor read before the products were, for catching up
+    after a reconnect.
+    """
+    batch_size = getattr(settings, 'PRODUCT_BROADCAST_BATCH_SIZE', 100)
+    cursor = sync_cursor()
+    products = list(
+        Product.objects.select_related('category', 'supplier').prefetch_related('images')
+        .filter(pk__in=product_ids).order_by('pk')
+    )
+    frames = defaultdict(list)
+    for product, data in zip(products, ProductSerializer(products, many=True).data):
+        for group in product_groups(product):
+            frames[group].append(data)
+
+    send = async_to_sync(get_channel_layer().group_send)
+    for group, payloads in frames.items():
+        for start in range(0, len(payloads), batch_size):
+            send(group, {'type': 'products_update', 'products': payloads[start:start + batch_size], 'cursor': cursor})
+
+
+product_broadcaster = ProductBroadcaster()
@@ -0,0 +1,376 @@
+# inventory/cache.py
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+
+from .labels import QR_BOX_SIZE, qr_png
+from .workers import BackgroundWorker
+
+# Bump when ProductSerializer's output changes so old entries are ignored.
+SCHEMA_VERSION = 1
+
+
+class ProductRepresentationCache:
+    """
+    Rendered ``ProductSerializer`` output, one entry per product.
+
+    Entries live in the ``products`` cache alias (LocMemCache LRU by default,
+    Redis when ``PRODUCT_CACHE_URL`` is set) and are stored together with the
+    product's ``updated_at``, so an entry written before the last save is
+    treated as a miss even if an invalidation was lost. Hit/miss counters are
+    per process.
+    """
+
+    def __init__(self, alias='products'):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def key(self, product_id):
+        return f'product:v{SCHEMA_VERSION}:{product_id}'
+
+    @staticmethod
+    def version(product):
+        return product.updated_at.isoformat() if product.updated_at else None
+
+    def get(self, product):
+        entry = self.backend.get(self.key(product.pk))
+        hit = entry is not None and entry[0] == self.version(product)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry[1] if hit else None
+
+    def get_many(self, products):
+        entries = self.backend.get_many([self.key(product.pk) for product in products])
+        found = {}
+        for product in products:
+            entry = entries.get(self.key(product.pk))
+            if entry is not None and entry[0] == self.version(product):
+                found[product.pk] = entry[1]
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(products) - len(found)
+        return found
+
+    def set(self, product, data):
+        if product.pk is None or product.updated_at is None:
+            return
+        self.backend.set(self.key(product.pk), (self.version(product), data))
+
+    def invalidate(self, *product_ids):
+        if product_ids:
+            self.backend.delete_many([self.key(product_id) for product_id in product_ids])
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else None,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+product_cache = ProductRepresentationCache()
+
+
+class AnalyticsCache:
+    """
+    Computed analytics payloads, stored with the watermark they were
+    computed at (last movement id, rows in the window, product versions).
+
+    A request whose current watermark matches a recent entry is served from
+    the cache. When the watermark moved or the entry is older than
+    ``ANALYTICS_CACHE_MAX_AGE``, the stale payload is served while the
+    refresher recomputes it in the background. Only a cold miss computes
+    inline, and concurrent cold misses for one key in a process wait for
+    the first instead of repeating its queries.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, alias='analytics'):
+        self.alias = alias
+        self.refresher = BackgroundWorker('analytics-refresher')
+        self._stripes = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._lock = threading.Lock()
+        self.counts = {'hit': 0, 'stale': 0, 'miss': 0}
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @property
+    def max_age(self):
+        return getattr(settings, 'ANALYTICS_CACHE_MAX_AGE', 300)
+
+    @property
+    def background(self):
+        return getattr(settings, 'ANALYTICS_CACHE_BACKGROUND', True)
+
+    def key(self, *parts):
+        return 'analytics:' + ':'.join(str(part) for part in parts)
+
+    def _count(self, state):
+        with self._lock:
+            self.counts[state] += 1
+
+    def _is_fresh(self, entry, watermark):
+        return entry[0] == watermark and time.time() - entry[1] < self.max_age
+
+    def get(self, key, watermark, compute, compute_watermark):
+        """
+        Returns ``(data, data_watermark, state)`` with state ``hit``,
+        ``stale`` or ``miss``. ``compute_watermark`` is called again by the
+        refresher, before ``compute``, so a stored payload is never older
+        than its watermark.
+        """
+        entry = self.backend.get(key)
+        if entry is not None and self._is_fresh(entry, watermark):
+            self._count('hit')
+            return entry[2], entry[0], 'hit'
+        if entry is not None and self.background:
+            self.refresher.submit(key, lambda: self.refresh(key, compute_watermark, compute))
+            self._count('stale')
+            return entry[2], entry[0], 'stale'
+
+        with self._stripes[hash(key) % self.LOCK_STRIPES]:
+            entry = self.backend.get(key)
+            if entry is not None and self._is_fresh(entry, watermark):
+                self._count('hit')
+                return entry[2], entry[0], 'hit'
+            data = compute()
+            self.backend.set(key, (watermark, time.time(), data))
+        self._count('miss')
+        return data, watermark, 'miss'
+
+    def refresh(self, key, compute_watermark, compute):
+        # Across processes, whoever adds the lock key first recomputes.
+        lock_key = key + ':refreshing'
+        if not self.backend.add(lock_key, True, timeout=self.max_age):
+            return
+        try:
+            watermark = compute_watermark()
+            self.backend.set(key, (watermark, time.time(), compute()))
+        finally:
+            self.backend.delete(lock_key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            total = sum(self.counts.values())
+            return dict(
+                self.counts,
+                backend=type(self.backend).__name__,
+                hit_rate=(self.counts['hit'] + self.counts['stale']) / total if total else None,
+            )
+
+    def reset_stats(self):
+        with self._lock:
+            self.counts = dict.fromkeys(self.counts, 0)
+
+
+analytics_cache = AnalyticsCache()
+
+
+class UserCache:
+    """
+    Authenticated users with their groups, so a request or websocket
+    connect carrying a JWT skips the user and groups queries.
+
+    Entries are keyed by user id and token id and live in the ``users``
+    cache alias for ``USER_CACHE_TTL`` seconds. Each user also has a stamp
+    that is part of every entry key; ``invalidate`` replaces it, orphaning
+    the entries of all that user's tokens at once. The password hash is
+    not cached: it loads on first access, and saving a cached user leaves
+    it untouched. With a dummy backend the cache is not ``enabled``.
+    """
+
+    def __init__(self, alias='users'):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @property
+    def enabled(self):
+        # A dummy backend stores nothing, so every lookup would load anyway.
+        return not isinstance(self.backend, DummyCache)
+
+    def stamp_key(self, user_id):
+        return f'user:stamp:{user_id}'
+
+    def key(self, user_id, stamp, token_id):
+        return f'user:{user_id}:{stamp}:{token_id}'
+
+    def get(self, user_id, token_id, load):
+        """The user, from the cache or else ``load(user_id)`` (a User with groups prefetched)."""
+        stamp = self.backend.get(self.stamp_key(user_id))
+        entry = self.backend.get(self.key(user_id, stamp, token_id)) if stamp else None
+        with self._lock:
+            if entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is not None:
+            return self._restore(entry)
+
+        # The stamp is read before loading: if the user changes meanwhile,
+        # what we store lands under a stamp that is already replaced.
+        if not stamp:
+            self.backend.add(self.stamp_key(user_id), uuid.uuid4().hex, timeout=None)
+            stamp = self.backend.get(self.stamp_key(user_id))
+        user = load(user_id)
+        self.backend.set(self.key(user_id, stamp, token_id), self._freeze(user))
+        return user
+
+    @staticmethod
+    def _freeze(user):
+        fields = {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields if field.attname != 'password'
+        }
+        return fields, [(group.pk, group.name) for group in user.groups.all()]
+
+    @staticmethod
+    def _restore(entry):
+        from django.contrib.auth.models import Group, User
+        fields, groups = entry
+        user = User.from_db('default', list(fields), list(fields.values()))
+        cached_groups = user.groups.get_queryset()
+        cached_groups._result_cache = [Group.from_db('default', ['id', 'name'], group) for group in groups]
+        cached_groups._prefetch_done = True
+        user._prefetched_objects_cache = {'groups': cached_groups}
+        return user
+
+    def invalidate(self, *user_ids):
+        if user_ids:
+            self.backend.set_many({self.stamp_key(user_id): uuid.uuid4().hex for user_id in user_ids}, timeout=None)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__,
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else None,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+user_cache = UserCache()
+
+
+class QRCodeCache:
+    """
+    Rendered QR code PNGs, addressed by a digest of what they encode and
+    how they are drawn. A lookup tries an in-process LRU of
+    ``QR_CACHE_MAX_ENTRIES`` codes, then ``MEDIA_ROOT/qrcodes``, and only
+    then renders, filling both. Files are written under a temporary name
+    and renamed into place, so concurrent workers never read half a file.
+    """
+
+    def __init__(self, directory='qrcodes'):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self.counts = {'memory': 0, 'disk': 0, 'rendered': 0}
+
+    @staticmethod
+    def digest(data):
+        return hashlib.sha256(f'qr:{QR_BOX_SIZE}:{data}'.encode('utf-8')).hexdigest()
+
+    def path(self, digest):
+        return os.path.join(settings.MEDIA_ROOT, self.directory, digest[:2], f'{digest}.png')
+
+    def get(self, data):
+        digest = self.digest(data)
+        with self._lock:
+            png = self._memory.get(digest)
+            if png is not None:
+                self._memory.move_to_end(digest)
+                self.counts['memory'] += 1
+                return png
+        try:
+            with open(self.path(digest), 'rb') as cached:
+                png = cached.read()
+            state = 'disk'
+        except FileNotFoundError:
+            png = qr_png(data)
+            self.store(digest, png)
+            state = 'rendered'
+        self._remember(digest, png, state)
+        return png
+
+    def has(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def store(self, digest, png):
+        path = self.path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(partial, 'wb') as output:
+            output.write(png)
+        os.replace(partial, path)
+
+    def _remember(self, digest, png, state):
+        limit = getattr(settings, 'QR_CACHE_MAX_ENTRIES', 2048)
+        with self._lock:
+            self.counts[state] += 1
+            self._memory[digest] = png
+            self._memory.move_to_end(digest)
+            while len(self._memory) > limit:
+                self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, entries=len(self._memory))
+
+
+qr_cache = QRCodeCache()
+
+
+def product_qr_data(product_id):
+    return getattr(settings, 'PRODUCT_QR_URL', 'http://localhost:3000/products/{pk}').format(pk=product_id)
@@ -0,0 +1,124 @@
+# inventory/changes.py
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, Max, Min, OuterRef, Q
+from django.utils import timezone
+
+from .models import Product, ProductChange
+from .serializers import ProductSerializer
+
+SYNC_PAGE_SIZE = 500
+COMPACT_BATCH_SIZE = 5000
+
+# Sequence numbers are handed out at insert but become visible at commit,
+# so a lower seq can appear after a higher one. Cursors given to clients
+# stop short of rows younger than this; those are sent again next time.
+SYNC_GRACE = timedelta(seconds=5)
+
+
+class ResyncRequired(Exception):
+    """The cursor predates the retained change log (or is from another database)."""
+
+    def __init__(self, cursor):
+        super().__init__(f"Cursor is too old; reload and resume from {cursor}.")
+        self.cursor = cursor
+
+
+def record_product_changes(product_ids, deleted=False):
+    """Logs a change to each product. Call it in the transaction that writes them."""
+    ProductChange.objects.bulk_create(
+        [ProductChange(product_id=product_id, deleted=deleted) for product_id in dict.fromkeys(product_ids)]
+    )
+
+
+def _log_bounds():
+    return ProductChange.objects.aggregate(
+        first=Min('seq'), last=Max('seq'),
+        settled=Max('seq', filter=Q(changed_at__lt=timezone.now() - SYNC_GRACE)),
+    )
+
+
+def _settled_cursor(bounds):
+    if bounds['settled'] is not None:
+        return bounds['settled']
+    return bounds['first'] - 1 if bounds['first'] is not None else 0
+
+
+def sync_cursor():
+    """The cursor a client holding current data can resume from."""
+    return _settled_cursor(_log_bounds())
+
+
+def changes_since(cursor, products=None, limit=SYNC_PAGE_SIZE):
+    """
+    What changed after ``cursor``: the current data of each updated product
+    and the ids of deleted ones, limited to ``products`` (a Product queryset)
+    when given. A product changed outside ``products`` is listed in ``left``,
+    since the change may be what took it out of the set (a new category, a
+    restock). Returns ``{'cursor', 'more', 'products', 'deleted', 'left'}``;
+    with ``more`` set, call again with the returned cursor. Raises
+    ResyncRequired when the log no longer reaches back to ``cursor``.
+    """
+    bounds = _log_bounds()
+    if cursor > (bounds['last'] or 0) or (bounds['first'] is not None and cursor < bounds['first'] - 1):
+        raise ResyncRequired(_settled_cursor(bounds))
+
+    rows = ProductChange.objects.filter(seq__gt=cursor).order_by('seq')
+    rows = list(rows.values_list('seq', 'product_id', 'deleted')[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest = {product_id: deleted for _, product_id, deleted in rows}
+    product_ids = [product_id for product_id, deleted in latest.items() if not deleted]
+    left = []
+    if products is not None:
+        wanted = dict(
+            Product.objects.filter(pk__in=product_ids)
+            .annotate(wanted=Exists(products.filter(pk=OuterRef('pk')))).values_list('pk', 'wanted')
+        )
+        product_ids = [product_id for product_id, is_wanted in wanted.items() if is_wanted]
+        left = sorted(product_id for product_id, is_wanted in wanted.items() if not is_wanted)
+    updated = list(
+        Product.objects.select_related('category', 'supplier').prefetch_related('images')
+        .filter(pk__in=product_ids).order_by('pk')
+    )
+    found = {product.pk for product in updated}.union(left)
+    return {
+        'cursor': rows[-1][0] if more else max(cursor, _settled_cursor(bounds)),
+        'more': more,
+        'products': ProductSerializer(updated, many=True).data,
+        # Includes products updated and then deleted before this read.
+        'deleted': sorted(product_id for product_id in latest if product_id not in found),
+        'left': left,
+    }
+
+
+def compact_changes(retention=None):
+    """
+    Deletes log rows superseded by a newer row for the same product, which
+    no cursor needs, and rows older than ``retention`` (default
+    PRODUCT_CHANGE_RETENTION_DAYS). Cursors from before the oldest row left
+    then get ResyncRequired. The newest row always stays, so the log keeps
+    its position. Returns the number of rows deleted.
+    """
+    if retention is None:
+        retention = timedelta(days=getattr(settings, 'PRODUCT_CHANGE_RETENTION_DAYS', 7))
+    last = ProductChange.objects.aggregate(last=Max('seq'))['last']
+    if last is None:
+        return 0
+    deleted, _ = ProductChange.objects.filter(changed_at__lt=timezone.now() - retention).exclude(seq=last).delete()
+
+    # The oldest row marks how far back cursors are valid, so it stays even
+    # when superseded. Collected first, since MySQL cannot delete from a
+    # table its subquery reads.
+    first = ProductChange.objects.aggregate(first=Min('seq'))['first']
+    newest = dict(ProductChange.objects.values('product_id').annotate(seq=Max('seq')).values_list('product_id', 'seq'))
+    superseded = [
+        seq for seq, product_id in ProductChange.objects.exclude(seq=first).values_list('seq', 'product_id').iterator()
+        if seq != newest.get(product_id, seq)
+    ]
+    for start in range(0, len(superseded), COMPACT_BATCH_SIZE):
+        deleted += ProductChange.objects.filter(seq__in=superseded[start:start + COMPACT_BATCH_SIZE]).delete()[0]
+    return deleted
@@ -0,0 +1,74 @@
+# inventory/conditional.py
+
+import hashlib
+
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = parse_etags(header)
+    return '*' in tags or etag in tags
+
+
+def conditional_get(request, compute_etag, render):
+    """
+    Answers a GET with ``304 Not Modified`` when the client's If-None-Match
+    matches ``compute_etag()``, without calling ``render``. ``compute_etag``
+    should be a cheap validator query, never the full queryset.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return render()
+
+    etag = compute_etag()
+    if etag is None:
+        return render()
+    if etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = render()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalListMixin:
+    """
+    Adds ETag validation to ``list`` and ``retrieve`` on a viewset.
+
+    Subclasses implement ``get_list_etag(queryset)`` and/or
+    ``get_detail_etag(pk)``; returning ``None`` disables validation for that
+    request.
+    """
+
+    def get_list_etag(self, queryset):
+        return None
+
+    def get_detail_etag(self, pk):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return conditional_get(
+            request,
+            lambda: self.get_list_etag(self.filter_queryset(self.get_queryset())),
+            lambda: super(ConditionalListMixin, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_get(
+            request,
+            lambda: self.get_detail_etag(kwargs.get(self.lookup_url_kwarg or self.lookup_field)),
+            lambda: super(ConditionalListMixin, self).retrieve(request, *args, **kwargs),
+        )
@@ -1,21 +1,154 @@
 # inventory/consumers.py
 import json
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.db.models import F, Q
+
+from .changes import ResyncRequired, changes_since
+from .models import Product
+from .topics import ALL_PRODUCTS_GROUP, LOW_STOCK_GROUP, category_group, product_group
+
+MAX_SUBSCRIPTIONS = 500
+
+
+class SubscriptionError(ValueError):
+    pass
+
+
+def requested_groups(message):
+    """
+    Groups named by a subscription message::
+
+        {"action": "subscribe", "categories": [3], "products": [12, 40], "low_stock": true}
+
+    ``"all": true`` asks for every product change.
+    """
+    groups = set()
+    for key, group_for in (('categories', category_group), ('products', product_group)):
+        ids = message.get(key, [])
+        if not isinstance(ids, list) or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+            raise SubscriptionError(f'{key} must be a list of ids')
+        groups.update(group_for(pk) for pk in ids)
+    if message.get('low_stock'):
+        groups.add(LOW_STOCK_GROUP)
+    if message.get('all'):
+        groups.add(ALL_PRODUCTS_GROUP)
+    return groups
+
 
 class ProductConsumer(AsyncWebsocketConsumer):
+    """
+    Clients start out receiving every product change. Sending ``subscribe``,
+    ``unsubscribe`` or ``set`` (replace all subscriptions) narrows that to
+    the named categories, products and low-stock feed; see requested_groups.
+    Each message is answered with the resulting subscriptions.
+
+    A product leaving the low-stock feed is announced to its product and
+    category groups but not to the feed, so a low-stock view should also
+    subscribe to the products it shows.
+
+    Update frames carry a ``cursor``. A reconnecting client sends
+    ``{"action": "sync", "cursor": N}`` (or connects with ``?cursor=N``) and
+    gets a ``changes`` message with what its subscriptions missed, or
+    ``resync_required`` when N is too old and it must reload instead.
+    Products that changed their way out of the subscriptions are in its
+    ``left`` list, to be dropped like ``deleted`` ones.
+    """
+
     async def connect(self):
-        self.group_name = 'products_group'
-        await self.channel_layer.group_add(
-            self.group_name,
-            self.channel_name
-        )
+        self.groups_joined = set()
+        self.subscribed = False
+        await self.join({ALL_PRODUCTS_GROUP})
         await self.accept()
+        cursor = parse_qs(self.scope.get('query_string', b'').decode()).get('cursor')
+        if cursor:
+            await self.sync(cursor[0])
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.group_name,
-            self.channel_name
-        )
+        await self.leave(set(self.groups_joined))
+
+    async def join(self, groups):
+        for group in groups - self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.groups_joined |= groups
+
+    async def leave(self, groups):
+        for group in groups & self.groups_joined:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self.groups_joined -= groups
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            message = json.loads(text_data or '')
+            if not isinstance(message, dict):
+                raise SubscriptionError('Expected a JSON object')
+            action = message.get('action')
+            if action == 'sync':
+                return await self.sync(message.get('cursor'))
+            if action not in ('subscribe', 'unsubscribe', 'set'):
+                raise SubscriptionError("action must be 'subscribe', 'unsubscribe', 'set' or 'sync'")
+            groups = requested_groups(message)
+        except ValueError as e:
+            await self.send(text_data=json.dumps({'type': 'error', 'error': str(e)}))
+            return
+
+        if action == 'unsubscribe':
+            await self.leave(groups)
+            return await self.send_subscriptions()
+
+        current = self.groups_joined if self.subscribed else set()
+        wanted = groups if action == 'set' else current | groups
+        if len(wanted) > MAX_SUBSCRIPTIONS:
+            await self.send(text_data=json.dumps({
+                'type': 'error', 'error': f'At most {MAX_SUBSCRIPTIONS} subscriptions per connection',
+            }))
+            return
+        # The first subscription replaces the default everything-feed.
+        self.subscribed = True
+        await self.leave(self.groups_joined - wanted)
+        await self.join(wanted)
+        await self.send_subscriptions()
+
+    async def sync(self, cursor):
+        try:
+            if isinstance(cursor, bool):
+                raise ValueError
+            cursor = int(cursor)
+        except (TypeError, ValueError):
+            await self.send(text_data=json.dumps({'type': 'error', 'error': 'cursor must be an integer'}))
+            return
+        try:
+            changes = await database_sync_to_async(changes_since)(cursor, self.subscribed_products())
+        except ResyncRequired as e:
+            await self.send(text_data=json.dumps({'type': 'resync_required', 'cursor': e.cursor}))
+            return
+        await self.send(text_data=json.dumps({'type': 'changes', **changes}))
+
+    def subscribed_ids(self):
+        return {
+            key: sorted(int(group[len(prefix):]) for group in self.groups_joined if group.startswith(prefix))
+            for key, prefix in (('categories', category_group('')), ('products', product_group('')))
+        }
+
+    def subscribed_products(self):
+        """The products this connection receives updates for; None for all."""
+        if ALL_PRODUCTS_GROUP in self.groups_joined:
+            return None
+        ids = self.subscribed_ids()
+        wanted = Q(pk__in=ids['products']) | Q(category_id__in=ids['categories'])
+        if LOW_STOCK_GROUP in self.groups_joined:
+            wanted |= Q(quantity__lte=F('reorder_point'))
+        return Product.objects.filter(wanted)
+
+    async def send_subscriptions(self):
+        await self.send(text_data=json.dumps({
+            'type': 'subscriptions',
+            **self.subscribed_ids(),
+            'low_stock': LOW_STOCK_GROUP in self.groups_joined,
+            'all': ALL_PRODUCTS_GROUP in self.groups_joined,
+        }))
 
     async def product_update(self, event):
         product_data = event['product']
@@ -23,3 +156,10 @@ class ProductConsumer(AsyncWebsocketConsumer):
             'type': 'product_update',
             'product': product_data
         }))
+
+    async def products_update(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'products_update',
+            'products': event['products'],
+            'cursor': event.get('cursor'),
+        }))
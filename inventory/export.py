@@ -0,0 +1,131 @@
+# inventory/export.py
+
+import csv
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+
+CHUNK_SIZE = 2000
+
+PRODUCT_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('name', 'name'),
+    ('sku', 'sku'),
+    ('category_id', 'category_id'),
+    ('category', 'category__name'),
+    ('supplier_id', 'supplier_id'),
+    ('supplier', 'supplier__name'),
+    ('cost_price', 'cost_price'),
+    ('sale_price', 'sale_price'),
+    ('quantity', 'quantity'),
+    ('reorder_point', 'reorder_point'),
+    ('updated_at', 'updated_at'),
+]
+
+STOCK_MOVEMENT_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('product_id', 'product_id'),
+    ('sku', 'product__sku'),
+    ('quantity_change', 'quantity_change'),
+    ('reason', 'reason'),
+    ('user', 'user__username'),
+    ('timestamp', 'timestamp'),
+]
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class AsyncChunks:
+    """
+    Async iterator over a sync one, for StreamingHttpResponse under ASGI:
+    given a sync iterator there, Django reads it to the end before sending
+    the first byte. Each ``chunk_size`` items are pulled in one sync_to_async
+    call on the request's thread, where its database connection lives, and
+    sent as one part. ``close`` closes the sync iterator; the response calls
+    it once it is done, and iteration calls it when cancelled because the
+    client went away.
+    """
+
+    def __init__(self, iterator, chunk_size=1):
+        self.iterator = iter(iterator)
+        self.chunk_size = chunk_size
+
+    def _take(self):
+        return list(islice(self.iterator, self.chunk_size))
+
+    async def __aiter__(self):
+        take = sync_to_async(self._take)
+        try:
+            while chunk := await take():
+                yield b''.join(part.encode() if isinstance(part, str) else part for part in chunk)
+        finally:
+            # On the request's thread, after any _take still running there.
+            await sync_to_async(self.close)()
+
+    def close(self):
+        close = getattr(self.iterator, 'close', None)
+        if close is not None:
+            close()
+
+
+def streaming_response(request, stream, content_type, chunk_size=1):
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        stream = AsyncChunks(stream, chunk_size)
+    return StreamingHttpResponse(stream, content_type=content_type)
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def iter_rows(queryset, columns, chunk_size=CHUNK_SIZE):
+    # values_list skips model instantiation; iterator() streams from a
+    # server-side cursor where the backend has one, so memory stays flat.
+    lookups = [lookup for _, lookup in columns]
+    return queryset.values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def iter_csv(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def iter_ndjson(rows, columns):
+    names = [name for name, _ in columns]
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(names, row))) + '\n'
+
+
+def export_response(request, queryset, columns, filename):
+    output = request.query_params.get('output', 'csv')
+    if output not in CONTENT_TYPES:
+        raise ValidationError({'output': f"Must be one of: {', '.join(CONTENT_TYPES)}."})
+
+    rows = iter_rows(queryset, columns)
+    stream = iter_csv(rows, columns) if output == 'csv' else iter_ndjson(rows, columns)
+    response = streaming_response(request, stream, CONTENT_TYPES[output], chunk_size=CHUNK_SIZE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{output}"'
+    return response
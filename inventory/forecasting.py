@@ -0,0 +1,194 @@
+# inventory/forecasting.py
+
+# Model fitting only. Nothing here imports Django, so process-pool workers
+# can load this module without configuring settings or the app registry.
+
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+MONTHLY = 'ME'
+MIN_SALES = 3
+MIN_MONTHS = 3
+FORECAST_STEPS = 4
+# ARIMA is only a candidate with at least this much history; on shorter
+# series it rarely converges and never beats the smoothing models.
+ARIMA_MIN_MONTHS = 12
+
+SMOOTHING = np.linspace(0.1, 0.9, 9)
+SELECTION_MARGIN = 0.25
+
+
+def monthly_sales(frame):
+    """
+    Units sold per calendar month, gaps filled with zero, from a frame with
+    ``timestamp`` and ``quantity_change`` columns. With a ``product_id``
+    column the result is indexed by (product_id, month).
+    """
+    frame = frame.assign(
+        timestamp=pd.to_datetime(frame['timestamp']), quantity_sold=frame['quantity_change'].abs()
+    ).set_index('timestamp')
+    if 'product_id' in frame:
+        return frame.groupby('product_id')['quantity_sold'].resample(MONTHLY).sum()
+    return frame['quantity_sold'].resample(MONTHLY).sum()
+
+
+# Each model takes the history as a float array and returns ``steps``
+# predictions. The smoothing models fit every parameter on the SMOOTHING
+# grid at once, one array lane per setting, and keep the one with the
+# lowest in-sample one-step squared error.
+
+def ses(y, steps):
+    """Simple exponential smoothing: a flat forecast at the smoothed level."""
+    level, sse = np.full(len(SMOOTHING), y[0]), np.zeros(len(SMOOTHING))
+    for value in y[1:]:
+        sse += (value - level) ** 2
+        level += SMOOTHING * (value - level)
+    return np.repeat(level[np.argmin(sse)], steps)
+
+
+def holt(y, steps):
+    """Holt's linear trend: smoothed level plus smoothed slope."""
+    alpha, beta = (grid.ravel() for grid in np.meshgrid(SMOOTHING, SMOOTHING))
+    level, trend = np.full(len(alpha), y[0]), np.full(len(alpha), y[1] - y[0])
+    sse = np.zeros(len(alpha))
+    for value in y[1:]:
+        predicted = level + trend
+        sse += (value - predicted) ** 2
+        new_level = alpha * value + (1 - alpha) * predicted
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        level = new_level
+    best = np.argmin(sse)
+    return level[best] + trend[best] * np.arange(1, steps + 1)
+
+
+def croston(y, steps):
+    """
+    Croston's method for intermittent demand: smooths the size of non-zero
+    sales and the gap between them separately and forecasts their ratio.
+    """
+    sold = np.flatnonzero(y > 0)
+    if not len(sold):
+        return np.zeros(steps)
+    size = np.full(len(SMOOTHING), y[sold[0]])
+    interval = np.full(len(SMOOTHING), float(sold[0] + 1))
+    sse, since_sale = np.zeros(len(SMOOTHING)), 1
+    for value in y[sold[0] + 1:]:
+        sse += (value - size / interval) ** 2
+        if value > 0:
+            size += SMOOTHING * (value - size)
+            interval += SMOOTHING * (since_sale - interval)
+            since_sale = 1
+        else:
+            since_sale += 1
+    best = np.argmin(sse)
+    return np.repeat(size[best] / interval[best], steps)
+
+
+def arima(y, steps):
+    # statsmodels (and SciPy under it) is the slowest import here, and only
+    # products with a year of history ever reach ARIMA.
+    from statsmodels.tsa.arima.model import ARIMA
+    return np.asarray(ARIMA(y, order=(1, 1, 1)).fit().forecast(steps=steps))
+
+
+# Cheapest first.
+MODELS = {
+    'ses': ses,
+    'croston': croston,
+    'holt': holt,
+    'arima': arima,
+}
+
+
+def candidates(y):
+    return [name for name in MODELS if name != 'arima' or len(y) >= ARIMA_MIN_MONTHS]
+
+
+def backtest(y, model, holdout):
+    """
+    Fits ``model`` on all but the last ``holdout`` points and returns
+    ``(mean absolute error on them, fit seconds)``. Fitting errors propagate.
+    """
+    started = time.perf_counter()
+    predictions = predict(model, y[:-holdout], holdout)
+    elapsed = time.perf_counter() - started
+    return float(np.mean(np.abs(predictions - y[-holdout:]))), elapsed
+
+
+def rank_models(y):
+    """
+    Candidate models, best first on a holdout of the last months. The
+    cheapest model within SELECTION_MARGIN of the best error leads, since a
+    few held-out months cannot tell closer results apart. Models that fail
+    the backtest go last; too short a history to hold any months out keeps
+    the default order, cheapest first.
+    """
+    names = candidates(y)
+    holdout = min(FORECAST_STEPS, len(y) - MIN_MONTHS)
+    if holdout < 1:
+        return names
+    errors = {}
+    for name in names:
+        try:
+            errors[name] = backtest(y, name, holdout)[0]
+        except Exception:
+            errors[name] = np.inf
+    best = min(errors.values())
+    chosen = next(name for name in names if errors[name] <= best * (1 + SELECTION_MARGIN))
+    return [chosen] + sorted((name for name in names if name != chosen), key=errors.get)
+
+
+def predict(model, y, steps):
+    if model == 'auto':
+        model = rank_models(y)[0]
+    predictions = MODELS[model](y, steps)
+    if not np.all(np.isfinite(predictions)):
+        raise ValueError(f"{model} produced non-finite predictions")
+    return predictions
+
+
+def fit_forecast(sales_by_month, model='auto'):
+    """
+    Forecasts a monthly series with ``model``, or with the best model on
+    backtest when 'auto', falling back down the ranking if the chosen one
+    fails to fit. Returns the forecast payload, or None when the series is
+    too short. Raises if no model fits.
+    """
+    if len(sales_by_month) < MIN_MONTHS:
+        return None
+    y = sales_by_month.to_numpy(dtype=float)
+    ranking = rank_models(y) if model == 'auto' else [model]
+    for position, name in enumerate(ranking, start=1):
+        try:
+            predictions = predict(name, y, FORECAST_STEPS)
+            break
+        except Exception:
+            if position == len(ranking):
+                raise
+    return {
+        "historical": {
+            "labels": sales_by_month.index.strftime('%Y-%m').tolist(),
+            "data": sales_by_month.values.tolist(),
+        },
+        "forecast": [int(max(0, p)) for p in predictions],
+        "model": name,
+    }
+
+
+def fit_many(series_by_product, model='auto'):
+    """
+    Process-pool entry point: fits ``[(product_id, series), ...]`` and returns
+    ``[(product_id, payload, error), ...]``, one failure never stopping the rest.
+    """
+    results = []
+    for product_id, sales_by_month in series_by_product:
+        try:
+            results.append((product_id, fit_forecast(sales_by_month, model), None))
+        except Exception as e:
+            results.append((product_id, None, f"{type(e).__name__}: {e}"))
+    return results
@@ -0,0 +1,210 @@
+# inventory/forecasts.py
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain
+
+from django.conf import settings
+from django.db.models import F, OuterRef, Q, Subquery
+
+from .models import Product, ProductForecast, StockMovement
+from .tasks import forecast_model, get_sales_forecast
+from .workers import BackgroundWorker
+
+forecast_worker = BackgroundWorker('forecast-worker')
+
+PENDING = {'status': 'pending'}
+
+BATCH_CHUNK_SIZE = 25
+BATCH_WRITE_SIZE = 1000
+
+
+def latest_sale():
+    """Subquery: id of the product's newest sale movement."""
+    return Subquery(
+        StockMovement.objects.filter(product_id=OuterRef('pk'), quantity_change__lt=0)
+        .order_by('-id').values('id')[:1]
+    )
+
+
+def refresh_forecast(product_id):
+    # Read the watermark before fitting: a sale landing mid-fit leaves the
+    # stored forecast behind, and it is picked up again.
+    last_sale_id = Product.objects.filter(pk=product_id).annotate(latest_sale=latest_sale()) \
+        .values_list('latest_sale', flat=True).first()
+    data = get_sales_forecast(product_id)
+    if not Product.objects.filter(pk=product_id).exists():
+        return
+    ProductForecast.objects.update_or_create(
+        product_id=product_id, defaults={'last_sale_id': last_sale_id, 'data': data}
+    )
+
+
+def schedule_forecasts(product_ids):
+    """
+    Queues recomputation on this process's worker thread when
+    FORECAST_BACKGROUND is on; otherwise forecast_worker picks them up.
+    """
+    if getattr(settings, 'FORECAST_BACKGROUND', False):
+        for product_id in product_ids:
+            forecast_worker.submit(product_id, lambda product_id=product_id: refresh_forecast(product_id))
+
+
+def stale_forecasts():
+    """Products with sales whose stored forecast is missing or outdated."""
+    return Product.objects.annotate(latest_sale=latest_sale()).filter(latest_sale__isnull=False).filter(
+        Q(stored_forecast__isnull=True)
+        | Q(stored_forecast__last_sale_id__isnull=True)
+        | ~Q(stored_forecast__last_sale_id=F('latest_sale'))
+    )
+
+
+def queue_forecasts(products):
+    """
+    Marks the stored forecasts of ``products`` stale, so forecast_worker or
+    ``manage.py forecast_batch`` refits them. Returns how many are queued.
+    """
+    ProductForecast.objects.filter(product__in=products).update(last_sale_id=None)
+    return stale_forecasts().filter(pk__in=products.values('pk')).count()
+
+
+def get_forecast(product_id):
+    """
+    The stored forecast for the detail view, never fitted inline. Returns
+    None without sales history, ``{'status': 'pending'}`` before the first
+    forecast exists, and the stored payload otherwise, with ``status``
+    ``'stale'`` while a newer one is being computed.
+    """
+    row = Product.objects.filter(pk=product_id).annotate(latest_sale=latest_sale()).values_list(
+        'latest_sale', 'stored_forecast__product_id', 'stored_forecast__last_sale_id', 'stored_forecast__data'
+    ).first()
+    if row is None or row[0] is None:
+        return None
+    latest, stored, last_sale_id, data = row
+    if stored is not None and last_sale_id == latest:
+        return data and {**data, 'status': 'ready'}
+    schedule_forecasts([product_id])
+    if stored is None:
+        return dict(PENDING)
+    return data and {**data, 'status': 'stale'}
+
+
+class ForecastReport:
+    def __init__(self, total=0):
+        self.total = total
+        self.done = 0
+        self.forecasted = 0
+        self.skipped = 0
+        self.errors = []
+
+    def add(self, product_id, data, error):
+        self.done += 1
+        if error is not None:
+            self.errors.append({'product_id': product_id, 'error': error})
+        elif data is None:
+            self.skipped += 1
+        else:
+            self.forecasted += 1
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'forecasted': self.forecasted,
+            'skipped': self.skipped,
+            'failed': len(self.errors),
+            'errors': sorted(self.errors, key=lambda error: error['product_id']),
+        }
+
+
+def max_forecast_processes():
+    return max(1, getattr(settings, 'FORECAST_MAX_PROCESSES', None) or os.cpu_count() or 1)
+
+
+def load_sales_history(products):
+    """
+    Every sale of ``products`` in one query, as ``{product_id: (last_sale_id,
+    monthly series or None)}``; the series is None below MIN_SALES sales.
+    """
+    import pandas as pd
+    from .forecasting import MIN_SALES, monthly_sales
+
+    rows = StockMovement.objects.filter(quantity_change__lt=0, product__in=products) \
+        .values_list('product_id', 'id', 'timestamp', 'quantity_change').order_by()
+    frame = pd.DataFrame.from_records(
+        rows.iterator(chunk_size=10000), columns=['product_id', 'id', 'timestamp', 'quantity_change']
+    )
+    if frame.empty:
+        return {}
+    by_product = frame.groupby('product_id')
+    last_sale_ids, sale_counts = by_product['id'].max(), by_product.size()
+    fitted = sale_counts.index[sale_counts >= MIN_SALES]
+    history = {int(product_id): (int(last_sale_ids[product_id]), None) for product_id in last_sale_ids.index}
+    if fitted.empty:
+        return history
+    monthly = monthly_sales(frame[frame['product_id'].isin(fitted)])
+    for product_id, sales_by_month in monthly.groupby(level='product_id'):
+        history[int(product_id)] = (history[int(product_id)][0], sales_by_month.droplevel('product_id'))
+    return history
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _fit_all(work, processes, chunk_size, model):
+    """Yields ``(product_id, data, error)`` as fits finish, in process when ``processes`` is 1."""
+    from .forecasting import fit_many
+
+    if processes <= 1:
+        for chunk in _chunks(work, chunk_size):
+            yield from fit_many(chunk, model)
+        return
+    # spawn, not fork: the caller may be a threaded web server, and forking
+    # a process that holds other threads' locks can deadlock the child.
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(fit_many, chunk, model) for chunk in _chunks(work, chunk_size)]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def run_batch_forecast(products=None, processes=None, progress=None, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Fits and stores forecasts for ``products`` (those with stale forecasts
+    when None) across at most ``processes`` worker processes, capped by
+    FORECAST_MAX_PROCESSES. ``progress(done, total)`` is called as results
+    arrive. Returns a ForecastReport; one product failing does not stop the
+    others, and its error is stored as a None forecast until its next sale.
+    """
+    if products is None:
+        products = stale_forecasts()
+    history = load_sales_history(products.values('pk'))
+    processes = min(processes or max_forecast_processes(), max_forecast_processes())
+    report = ForecastReport(len(history))
+
+    work = [(product_id, series) for product_id, (_, series) in history.items() if series is not None]
+    too_short = [(product_id, None, None) for product_id, (_, series) in history.items() if series is None]
+    results = chain(too_short, _fit_all(work, min(processes, len(work)), chunk_size, forecast_model()))
+
+    pending = []
+    for product_id, data, error in results:
+        report.add(product_id, data, error)
+        pending.append(ProductForecast(product_id=product_id, last_sale_id=history[product_id][0], data=data))
+        if len(pending) >= BATCH_WRITE_SIZE:
+            _store(pending)
+            pending = []
+        if progress is not None:
+            progress(report.done, report.total)
+    if pending:
+        _store(pending)
+    return report
+
+
+def _store(forecasts):
+    # Products deleted since the history was read would fail the insert.
+    existing = set(Product.objects.filter(pk__in=[f.product_id for f in forecasts]).values_list('pk', flat=True))
+    ProductForecast.objects.bulk_create(
+        [forecast for forecast in forecasts if forecast.product_id in existing],
+        update_conflicts=True, unique_fields=['product'], update_fields=['last_sale_id', 'data', 'computed_at'],
+    )
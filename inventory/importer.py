@@ -0,0 +1,198 @@
+# inventory/importer.py
+
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .cache import product_cache
+from .changes import record_product_changes
+from .models import Category, Product, StockMovement, Supplier
+from .rollup import record_movements
+from .search import rebuild_search_index
+from .signals import broadcast_products_update
+
+DEFAULT_BATCH_SIZE = 1000
+REQUIRED_FOR_CREATE = ('name', 'category_id', 'supplier_id', 'cost_price', 'sale_price')
+UPDATABLE_FIELDS = ('name', 'category_id', 'supplier_id', 'cost_price', 'sale_price', 'quantity', 'reorder_point')
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    """
+    Field-level validation only. Foreign keys are plain integers here and are
+    resolved once per batch, not once per row.
+    """
+    sku = serializers.CharField(max_length=100)
+    name = serializers.CharField(max_length=255, required=False)
+    category_id = serializers.IntegerField(required=False)
+    supplier_id = serializers.IntegerField(required=False)
+    cost_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    sale_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    quantity = serializers.IntegerField(min_value=0, required=False)
+    reorder_point = serializers.IntegerField(min_value=0, required=False)
+
+    def to_internal_value(self, data):
+        # Blank CSV cells mean "leave unchanged", not "set to empty".
+        if isinstance(data, dict):
+            data = {key: value for key, value in data.items() if value not in ('', None)}
+        return super().to_internal_value(data)
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def error(self, row_number, sku, errors):
+        self.errors.append({'row': row_number, 'sku': sku, 'errors': errors})
+
+    def batch_failed(self, batch, exc):
+        # Rows already reported keep their own errors; the rest were rolled back.
+        reported = {error['row'] for error in self.errors}
+        for row_number, row in batch:
+            if row_number not in reported:
+                sku = row.get('sku') if isinstance(row, dict) else None
+                self.error(row_number, sku, {'non_field_errors': [f'Not imported, its batch was rolled back: {exc}']})
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': len(self.errors),
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+        }
+
+
+def read_rows(stream, file_format):
+    """Yields row dicts from a text stream in csv, json or ndjson."""
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+    elif file_format == 'ndjson':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    elif file_format == 'json':
+        data = json.load(stream)
+        yield from (data.get('products', []) if isinstance(data, dict) else data)
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+
+def detect_format(filename, default='csv'):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in ('csv', 'json', 'ndjson') else default
+
+
+def open_upload(upload):
+    return io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+
+
+def import_products(rows, user=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Upserts products by SKU from an iterable of row dicts. Each batch is
+    validated, written with bulk_create/bulk_update in its own transaction
+    and announced to websocket clients with a single message. A batch that
+    hits an integrity error (say a SKU a concurrent writer just took) is
+    rolled back and reported as failed rows; the other batches stand.
+    """
+    report = ImportReport()
+    numbered = enumerate(rows, start=1)
+    while True:
+        batch = list(islice(numbered, batch_size))
+        if not batch:
+            break
+        try:
+            _import_batch(batch, user, report)
+        except IntegrityError as e:
+            report.batch_failed(batch, e)
+    return report
+
+
+def _import_batch(batch, user, report):
+    valid = {}
+    for row_number, row in batch:
+        serializer = ProductImportRowSerializer(data=row)
+        if not serializer.is_valid():
+            report.error(row_number, row.get('sku') if isinstance(row, dict) else None, serializer.errors)
+            continue
+        sku = serializer.validated_data['sku']
+        if sku in valid:
+            report.error(row_number, sku, {'sku': ['Duplicate SKU in the same batch.']})
+            continue
+        valid[sku] = (row_number, serializer.validated_data)
+
+    if not valid:
+        return
+
+    category_ids = {data['category_id'] for _, data in valid.values() if 'category_id' in data}
+    supplier_ids = {data['supplier_id'] for _, data in valid.values() if 'supplier_id' in data}
+    known_categories = set(Category.objects.filter(pk__in=category_ids).values_list('pk', flat=True))
+    known_suppliers = set(Supplier.objects.filter(pk__in=supplier_ids).values_list('pk', flat=True))
+
+    now = timezone.now()
+    with transaction.atomic():
+        existing = Product.objects.select_for_update().in_bulk(list(valid), field_name='sku')
+        to_create, to_update, movements = [], [], []
+
+        for sku, (row_number, data) in valid.items():
+            errors = {}
+            if 'category_id' in data and data['category_id'] not in known_categories:
+                errors['category_id'] = [f"Category {data['category_id']} does not exist."]
+            if 'supplier_id' in data and data['supplier_id'] not in known_suppliers:
+                errors['supplier_id'] = [f"Supplier {data['supplier_id']} does not exist."]
+
+            product = existing.get(sku)
+            if product is None:
+                missing = [field for field in REQUIRED_FOR_CREATE if field not in data]
+                for field in missing:
+                    errors[field] = ['This field is required for new products.']
+            if errors:
+                report.error(row_number, sku, errors)
+                continue
+
+            if product is None:
+                to_create.append(Product(sku=sku, **{k: v for k, v in data.items() if k != 'sku'}))
+                continue
+
+            delta = data.get('quantity', product.quantity) - product.quantity
+            for field in UPDATABLE_FIELDS:
+                if field in data:
+                    setattr(product, field, data[field])
+            product.updated_at = now
+            to_update.append(product)
+            if delta:
+                movements.append(StockMovement(
+                    product=product, quantity_change=delta, reason='Catalog import', user=user, timestamp=now
+                ))
+
+        if to_create:
+            Product.objects.bulk_create(to_create)
+            if any(product.pk is None for product in to_create):
+                # Backends without RETURNING (MySQL) leave pk unset.
+                ids = dict(Product.objects.filter(sku__in=[p.sku for p in to_create]).values_list('sku', 'pk'))
+                for product in to_create:
+                    product.pk = ids[product.sku]
+            movements.extend(
+                StockMovement(product=product, quantity_change=product.quantity, reason='Initial stock', user=user, timestamp=now)
+                for product in to_create if product.quantity
+            )
+        if to_update:
+            Product.objects.bulk_update(to_update, list(UPDATABLE_FIELDS) + ['updated_at'])
+        if movements:
+            StockMovement.objects.bulk_create(movements)
+            record_movements(movements)
+
+        product_ids = [product.pk for product in to_create + to_update]
+        if product_ids:
+            rebuild_search_index(Product.objects.filter(pk__in=product_ids))
+            product_cache.invalidate(*[product.pk for product in to_update])
+            record_product_changes(product_ids)
+            broadcast_products_update(product_ids)
+
+    report.created += len(to_create)
+    report.updated += len(to_update)
@@ -0,0 +1,210 @@
+# inventory/labels.py
+
+# QR codes and printable label sheets. Nothing here imports Django: label
+# pages are rendered in spawned worker processes.
+
+import atexit
+import io
+import multiprocessing
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+QR_BOX_SIZE = 10
+
+# A4 at 150 dpi, 3 x 8 labels: the common 24-up sheet.
+PAGE_SIZE = (1240, 1754)
+PAGE_DPI = 150
+PAGE_MARGIN = 40
+LABEL_COLUMNS = 3
+LABEL_ROWS = 8
+LABELS_PER_PAGE = LABEL_COLUMNS * LABEL_ROWS
+LABEL_PADDING = 10
+
+
+def qr_png(data):
+    import qrcode
+
+    buffer = io.BytesIO()
+    qrcode.make(data, box_size=QR_BOX_SIZE).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def qr_png_many(items):
+    """``[(key, data)]`` to ``[(key, png)]``; the unit of work for a process pool."""
+    return [(key, qr_png(data)) for key, data in items]
+
+
+def _fit_text(draw, text, font, width, lines):
+    # Greedy word wrap into at most ``lines`` lines, the last one cut short.
+    words, result = text.split(), []
+    while words and len(result) < lines:
+        line = words.pop(0)
+        while words and draw.textlength(f'{line} {words[0]}', font=font) <= width:
+            line = f'{line} {words.pop(0)}'
+        result.append(line)
+    if words or (result and draw.textlength(result[-1], font=font) > width):
+        last = result[-1]
+        while last and draw.textlength(last + '...', font=font) > width:
+            last = last[:-1]
+        result[-1] = last.rstrip() + '...'
+    return result
+
+
+def render_label_page(labels):
+    """
+    One sheet of ``(name, sku, qr_data)`` labels, at most LABELS_PER_PAGE.
+    Returns ``(width, height, pixels)``: 8-bit grayscale rows, deflated, as
+    a PDF image stream takes them.
+    """
+    import qrcode
+    from PIL import Image, ImageDraw, ImageFont
+
+    page = Image.new('L', PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    name_font = ImageFont.load_default(size=24)
+    sku_font = ImageFont.load_default(size=20)
+    cell_width = (PAGE_SIZE[0] - 2 * PAGE_MARGIN) // LABEL_COLUMNS
+    cell_height = (PAGE_SIZE[1] - 2 * PAGE_MARGIN) // LABEL_ROWS
+    side = cell_height - 2 * LABEL_PADDING
+    text_width = cell_width - side - 3 * LABEL_PADDING
+
+    for index, (name, sku, data) in enumerate(labels[:LABELS_PER_PAGE]):
+        left = PAGE_MARGIN + index % LABEL_COLUMNS * cell_width
+        top = PAGE_MARGIN + index // LABEL_COLUMNS * cell_height
+        # One pixel per module, scaled by a whole number so modules stay even.
+        code = qrcode.make(data, border=1, box_size=1).get_image().convert('L')
+        scaled = code.width * (side // code.width)
+        page.paste(code.resize((scaled, scaled), Image.NEAREST), (left + LABEL_PADDING, top + LABEL_PADDING))
+
+        text_left = left + side + 2 * LABEL_PADDING
+        y = top + LABEL_PADDING
+        for line in _fit_text(draw, name, name_font, text_width, lines=3):
+            draw.text((text_left, y), line, font=name_font, fill=0)
+            y += 30
+        draw.text((text_left, top + cell_height - LABEL_PADDING - 24), sku, font=sku_font, fill=0)
+
+    return page.width, page.height, zlib.compress(page.tobytes())
+
+
+def _pages(labels):
+    return [labels[start:start + LABELS_PER_PAGE] for start in range(0, len(labels), LABELS_PER_PAGE)]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def label_pool(processes, broken=None):
+    """
+    The process pool every label sheet in this process renders on, started
+    with ``processes`` workers on first use, so concurrent requests share
+    those workers instead of each starting its own. Passing a pool that
+    raised ``BrokenProcessPool`` (a worker died) as ``broken`` replaces it,
+    once however many requests noticed.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool is broken:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn, not fork: the caller may be a threaded web server.
+            _pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+@atexit.register
+def _shutdown_label_pool():
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_label_pages(labels, processes=1):
+    """
+    Yields rendered pages for ``labels`` in order. With more than one page
+    and ``processes`` above one, they render on the shared label pool, up
+    to ``processes`` beyond the one being waited for; closing the generator
+    (the client went away) cancels those not started yet.
+    """
+    pages = _pages(labels)
+    if processes <= 1 or len(pages) <= 1:
+        for page in pages:
+            yield render_label_page(page)
+        return
+    pool = label_pool(processes)
+    pending = deque()
+    try:
+        for page in pages:
+            try:
+                future = pool.submit(render_label_page, page)
+            except BrokenProcessPool:
+                pool = label_pool(processes, broken=pool)
+                future = pool.submit(render_label_page, page)
+            pending.append(future)
+            if len(pending) > processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def iter_pdf(pages, dpi=PAGE_DPI):
+    """
+    A PDF with one full-page grayscale image per page, written as the pages
+    arrive. Objects 1 and 2 (catalog and page tree) and the cross-reference
+    table come last, once every page is known. Closing it closes ``pages``.
+    """
+    offsets = {}
+    position = 0
+
+    def emit(chunk):
+        nonlocal position
+        position += len(chunk)
+        return chunk
+
+    def obj(number, dictionary, stream=None):
+        offsets[number] = position
+        if stream is None:
+            body = dictionary.encode()
+        else:
+            body = f'<< {dictionary} /Length {len(stream)} >>\nstream\n'.encode() + stream + b'\nendstream'
+        return emit(f'{number} 0 obj\n'.encode() + body + b'\nendobj\n')
+
+    yield emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    page_numbers = []
+    number = 3
+    try:
+        for width, height, pixels in pages:
+            page_width, page_height = f'{width * 72 / dpi:.2f}', f'{height * 72 / dpi:.2f}'
+            image, content, page = number, number + 1, number + 2
+            number += 3
+            yield obj(image, (
+                f'/Type /XObject /Subtype /Image /Width {width} /Height {height} '
+                f'/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode'
+            ), pixels)
+            yield obj(content, '', f'q {page_width} 0 0 {page_height} 0 0 cm /Im0 Do Q'.encode())
+            yield obj(page, (
+                f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width} {page_height}] '
+                f'/Resources << /XObject << /Im0 {image} 0 R >> >> /Contents {content} 0 R >>'
+            ))
+            page_numbers.append(page)
+    finally:
+        # Closing this generator must reach a page generator's cleanup.
+        close = getattr(pages, 'close', None)
+        if close is not None:
+            close()
+
+    kids = ' '.join(f'{page} 0 R' for page in page_numbers)
+    yield obj(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(page_numbers)} >>')
+    yield obj(1, '<< /Type /Catalog /Pages 2 0 R >>')
+    xref = position
+    entries = ''.join(f'{offsets[n]:010d} 00000 n \n' for n in range(1, number))
+    yield emit((
+        f'xref\n0 {number}\n0000000000 65535 f \n{entries}'
+        f'trailer\n<< /Size {number} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'
+    ).encode())
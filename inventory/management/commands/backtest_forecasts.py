@@ -0,0 +1,72 @@
+# inventory/management/commands/backtest_forecasts.py
+
+from collections import Counter
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from tqdm import tqdm
+
+from inventory.forecasting import FORECAST_STEPS, MIN_MONTHS, MODELS, backtest
+from inventory.forecasts import load_sales_history
+from inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Backtests the forecasting models on the stored sales history: each is fitted on all but '
+        'the last --holdout months of every product and scored on those months. Reports error, '
+        'fit time and how often each model is the most accurate.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--holdout', type=int, default=FORECAST_STEPS, help='Months held out per product.')
+        parser.add_argument(
+            '--models', nargs='+', choices=[*MODELS, 'auto'], default=[*MODELS, 'auto'],
+            help="Models to compare; 'auto' is the per-product choice FORECAST_MODEL=auto makes.",
+        )
+        parser.add_argument('--limit', type=int, help='Only backtest this many products.')
+
+    def handle(self, *args, **options):
+        holdout, models = options['holdout'], options['models']
+        if holdout < 1:
+            raise CommandError('--holdout must be at least 1.')
+        series = [
+            sales_by_month.to_numpy(dtype=float) for _, sales_by_month in load_sales_history(Product.objects.all()).values()
+            if sales_by_month is not None and len(sales_by_month) >= MIN_MONTHS + holdout
+        ][:options['limit']]
+        if not series:
+            raise CommandError(f'No product has {MIN_MONTHS + holdout} months of sales history.')
+
+        errors = {model: [] for model in models}
+        seconds = {model: [] for model in models}
+        actual = {model: 0.0 for model in models}
+        failed, wins = Counter(), Counter()
+        for y in tqdm(series, desc='Backtesting', unit='product', disable=options['verbosity'] == 0):
+            scores = {}
+            for model in models:
+                try:
+                    error, elapsed = backtest(y, model, holdout)
+                except Exception:
+                    failed[model] += 1
+                    continue
+                errors[model].append(error)
+                actual[model] += np.mean(y[-holdout:])
+                seconds[model].append(elapsed)
+                if model != 'auto':
+                    scores[model] = error
+            if scores:
+                wins[min(scores, key=scores.get)] += 1
+
+        self.stdout.write(f'{len(series)} products, last {holdout} months held out.')
+        self.stdout.write(f"{'model':<8} {'MAE':>8} {'WAPE':>7} {'fit ms':>8} {'p95 ms':>8} {'wins':>6} {'failed':>7}")
+        for model in models:
+            if not errors[model]:
+                self.stdout.write(f'{model:<8} {"-":>8} {"-":>7} {"-":>8} {"-":>8} {"-":>6} {failed[model]:>7}')
+                continue
+            # Failed fits are left out of the error columns, not counted as zero error.
+            fit_ms = np.array(seconds[model]) * 1000
+            wape = np.sum(errors[model]) / actual[model] if actual[model] else float('nan')
+            self.stdout.write(
+                f'{model:<8} {np.mean(errors[model]):>8.2f} {wape:>7.1%} {np.mean(fit_ms):>8.2f} '
+                f'{np.percentile(fit_ms, 95):>8.2f} {wins[model] if model != "auto" else "-":>6} {failed[model]:>7}'
+            )
@@ -0,0 +1,98 @@
+# inventory/management/commands/bench_adjust_stock.py
+
+import random
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+
+from inventory.models import Category, Product, StockMovement, Supplier
+from inventory.stock import InsufficientStock, adjust_stock
+
+
+def legacy_adjust(product_id, quantity_change, reason):
+    # The pre-change adjust_stock: read, check in Python, write back the value.
+    with transaction.atomic():
+        quantity = Product.objects.values_list('quantity', flat=True).get(pk=product_id)
+        if quantity + quantity_change < 0:
+            raise InsufficientStock()
+        StockMovement.objects.create(product_id=product_id, quantity_change=quantity_change, reason=reason)
+        Product.objects.filter(pk=product_id).update(quantity=quantity + quantity_change)
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammers one product with concurrent stock adjustments and checks that '
+        'the final quantity matches the StockMovement ledger.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--adjustments', type=int, default=200, help='Adjustments per worker.')
+        parser.add_argument('--initial-stock', type=int, default=1000)
+        parser.add_argument('--mode', choices=['atomic', 'legacy', 'both'], default='both')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        category = Category.objects.first()
+        supplier = Supplier.objects.first()
+        if category is None or supplier is None:
+            raise CommandError('Needs at least one category and supplier; run seed_data first.')
+
+        modes = ['legacy', 'atomic'] if options['mode'] == 'both' else [options['mode']]
+        for mode in modes:
+            self.run(mode, category, supplier, options)
+
+    def run(self, mode, category, supplier, options):
+        product = Product.objects.create(
+            name='Benchmark product', sku=f'BENCH-{uuid.uuid4().hex[:12]}', category=category,
+            supplier=supplier, cost_price=1, sale_price=2, quantity=options['initial_stock'],
+        )
+        adjuster = adjust_stock if mode == 'atomic' else legacy_adjust
+        results = {'applied': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def worker(worker_id):
+            rng = random.Random(options['seed'] * 1000 + worker_id)
+            counts = {'applied': 0, 'rejected': 0, 'errors': 0}
+            try:
+                for _ in range(options['adjustments']):
+                    delta = rng.choice([-5, -3, -2, -1, 1, 2, 4])
+                    try:
+                        adjuster(product.pk, delta, 'Benchmark')
+                        counts['applied'] += 1
+                    except InsufficientStock:
+                        counts['rejected'] += 1
+                    except OperationalError:
+                        counts['errors'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in counts.items():
+                        results[key] += value
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['workers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        ledger = StockMovement.objects.filter(product=product).aggregate(total=Sum('quantity_change'))['total'] or 0
+        expected = options['initial_stock'] + ledger
+        consistent = product.quantity == expected
+
+        style = self.style.SUCCESS if consistent else self.style.ERROR
+        self.stdout.write(style(
+            f"[{mode}] {options['workers']} workers, {results['applied']} applied, "
+            f"{results['rejected']} rejected, {results['errors']} db errors in {elapsed:.2f}s "
+            f"({results['applied'] / elapsed:.0f} adjustments/s). "
+            f"Final quantity {product.quantity}, ledger says {expected}: "
+            f"{'consistent' if consistent else f'{expected - product.quantity:+d} lost'}."
+        ))
+        product.delete()
@@ -0,0 +1,112 @@
+# inventory/management/commands/bench_analytics.py
+
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from inventory.analytics import dashboard_data, orm_dashboard_data
+from inventory.models import Product, StockMovement
+from inventory.rollup import SalesWindow, rebuild_sales_rollup
+from inventory.synthetic import create_catalog, create_movements
+
+
+def movement_dashboard_data(start):
+    # The original per-movement queries, before the daily rollup existed.
+    sales_movements = StockMovement.objects.filter(quantity_change__lt=0)
+    if start is not None:
+        sales_movements = sales_movements.filter(timestamp__gte=start)
+    revenue = Sum(F('quantity_change') * F('product__sale_price') * -1, output_field=DecimalField())
+    return {
+        'total_inventory_value': Product.objects.aggregate(total_value=Coalesce(Sum(F('quantity') * F('sale_price'), output_field=DecimalField()), 0, output_field=DecimalField()))['total_value'],
+        'total_products': Product.objects.count(),
+        'low_stock_items': Product.objects.filter(quantity__lte=F('reorder_point')).count(),
+        'category_distribution': list(sales_movements.values('product__category__name').annotate(count=Count('product', distinct=True)).order_by('-count')),
+        'sales_trend': list(sales_movements.annotate(day=TruncDate('timestamp')).values('day').annotate(total_revenue=revenue).order_by('day')),
+        'top_selling_products': list(sales_movements.values('product__name').annotate(units_sold=Sum('quantity_change') * -1).order_by('-units_sold')[:5]),
+        'revenue_by_category': list(sales_movements.values('product__category__name').annotate(total_revenue=revenue).order_by('-total_revenue')),
+    }
+
+
+def _normal(value):
+    # Backends differ in Decimal scale ('5' vs '5.00'), and SQLite sums
+    # decimals as floats, so compare money to the cent.
+    return round(float(value), 2) if isinstance(value, Decimal) else value
+
+
+def comparable(data):
+    result = {}
+    for key, value in data.items():
+        if isinstance(value, list):
+            value = sorted(tuple(_normal(field) for field in row.values()) for row in value)
+        result[key] = _normal(value)
+    # Products tied on units sold may be cut differently at the top five.
+    result['top_selling_products'] = sorted(row[-1] for row in result['top_selling_products'])
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the dashboard analytics paths (per-movement ORM, rollup ORM, NumPy engine) '
+        'on synthetic data. Everything is written inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000])
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--ranges', nargs='+', default=['all', '30'])
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            with transaction.atomic():
+                self.load(size, options)
+                for time_range in options['ranges']:
+                    self.compare(size, time_range, options)
+                transaction.set_rollback(True)
+
+    def load(self, size, options):
+        rng = np.random.default_rng(options['seed'])
+        started = time.perf_counter()
+        product_ids = create_catalog(options['products'], options['categories'], rng)
+        create_movements(product_ids, size, options['days'], rng)
+        loaded = time.perf_counter()
+        rollup_rows = rebuild_sales_rollup()
+        self.stdout.write(
+            f'{size:,} movements: loaded in {loaded - started:.1f}s, '
+            f'{rollup_rows:,} rollup rows built in {time.perf_counter() - loaded:.1f}s'
+        )
+
+    def compare(self, size, time_range, options):
+        start = None if time_range == 'all' else timezone.now() - timedelta(days=int(time_range))
+        paths = {
+            'movements': lambda: movement_dashboard_data(start),
+            'rollup': lambda: orm_dashboard_data(SalesWindow(start)),
+            'numpy': lambda: dashboard_data(SalesWindow(start)),
+        }
+        timings, results = {}, {}
+        for name, path in paths.items():
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                results[name] = path()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+
+        reference = comparable(results['movements'])
+        mismatched = [name for name in ('rollup', 'numpy') if comparable(results[name]) != reference]
+        line = f'  range={time_range}: ' + ', '.join(f'{name} {seconds * 1000:.1f}ms' for name, seconds in timings.items())
+        if mismatched:
+            self.stdout.write(self.style.ERROR(f"{line} - output differs: {', '.join(mismatched)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{line} - outputs match'))
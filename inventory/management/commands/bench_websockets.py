@@ -0,0 +1,253 @@
+# inventory/management/commands/bench_websockets.py
+
+import asyncio
+import gc
+import os
+import re
+import statistics
+import time
+import uuid
+from collections import Counter
+
+import numpy as np
+from channels.db import database_sync_to_async
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from inventory.broadcast import product_broadcaster
+from inventory.models import Category, Product, ProductChange
+from inventory.synthetic import create_catalog
+
+WRITE_PREFIX = 'Benchmark write '
+WRITE_SEQ = re.compile(re.escape(WRITE_PREFIX) + r'(\d+)')
+
+
+class LoopChannelLayer(InMemoryChannelLayer):
+    """
+    InMemoryChannelLayer whose queues belong to the benchmark's event loop.
+    The broadcaster sends from its worker thread on a loop of its own, and
+    asyncio queues must not be shared across loops, so those sends are
+    handed over to ``loop`` -- the hop Redis would make over the network.
+    """
+
+    loop = None
+
+    def _on_loop(self, coroutine):
+        if self.loop is None or asyncio.get_running_loop() is self.loop:
+            return coroutine
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self.loop))
+
+    async def send(self, channel, message):
+        return await self._on_loop(super().send(channel, message))
+
+    async def group_send(self, group, message):
+        return await self._on_loop(super().group_send(group, message))
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float('nan')
+
+
+def write_product(product_id, seq):
+    product = Product.objects.get(pk=product_id)
+    product.name = f'{WRITE_PREFIX}{seq}'
+    product.save()
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-tests product websocket fan-out: connects many authenticated clients to the ASGI '
+        'application in this process over an in-memory channel layer, saves products at a fixed '
+        'rate and reports delivery latency, throughput and memory per connection. Writes go to '
+        'tagged benchmark products and users in the configured database, deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=20, help='Distinct users the clients log in as.')
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--subscribe', choices=['all', 'category', 'product'], default='all',
+                            help='What each client listens to: every change (the default feed), one '
+                                 'category, or one product.')
+        parser.add_argument('--rate', type=float, default=20, help='Product saves per second.')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of writes.')
+        parser.add_argument('--connect-batch', type=int, default=200, help='Clients connecting at once.')
+        parser.add_argument('--broadcast-delay', type=float,
+                            help='Override PRODUCT_BROADCAST_DELAY, the coalescing window.')
+        parser.add_argument('--drain-timeout', type=float, default=120,
+                            help='Longest wait for deliveries still queued after the last write.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        product_ids = [int(pk) for pk in create_catalog(options['products'], options['categories'], rng)]
+        products = Product.objects.filter(pk__in=product_ids)
+        supplier = products.first().supplier
+        category_ids = sorted(Category.objects.filter(name__startswith=f'{supplier.name} ').values_list('pk', flat=True))
+        tag = uuid.uuid4().hex[:8]
+        User.objects.bulk_create(User(username=f'bench-{tag}-{i}') for i in range(options['users']))
+        users = list(User.objects.filter(username__startswith=f'bench-{tag}-'))
+        tokens = [str(AccessToken.for_user(user)) for user in users]
+
+        delay = options['broadcast_delay']
+        if delay is None:
+            delay = getattr(settings, 'PRODUCT_BROADCAST_DELAY', 0.25)
+        layers = {'default': {'BACKEND': f'{__name__}.LoopChannelLayer', 'CONFIG': {'capacity': 1000}}}
+        try:
+            with override_settings(CHANNEL_LAYERS=layers, PRODUCT_BROADCAST_DELAY=delay):
+                asyncio.run(self.run(tokens, product_ids, category_ids, delay, options))
+        finally:
+            products.delete()
+            ProductChange.objects.filter(product_id__in=product_ids).delete()
+            Category.objects.filter(pk__in=category_ids).delete()
+            supplier.delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    async def run(self, tokens, product_ids, category_ids, delay, options):
+        from backend.asgi import application
+
+        get_channel_layer().loop = asyncio.get_running_loop()
+        category_of = dict(await database_sync_to_async(
+            lambda: list(Product.objects.filter(pk__in=product_ids).values_list('pk', 'category_id'))
+        )())
+
+        # Which products each client hears about, for counting missed deliveries.
+        mode = options['subscribe']
+        subscriptions = []
+        for i in range(options['clients']):
+            if mode == 'product':
+                subscriptions.append({'products': [product_ids[i % len(product_ids)]]})
+            elif mode == 'category':
+                subscriptions.append({'categories': [category_ids[i % len(category_ids)]]})
+            else:
+                subscriptions.append(None)
+        listeners = Counter()
+        for subscription in subscriptions:
+            if subscription is None:
+                listeners.update(product_ids)
+            elif 'products' in subscription:
+                listeners.update(subscription['products'])
+            else:
+                listeners.update(pk for pk in product_ids if category_of[pk] in subscription['categories'])
+
+        gc.collect()
+        rss_before = rss_mb()
+        clients, connect_times = [], []
+
+        async def connect(i):
+            client = WebsocketCommunicator(application, f'/ws/products/?token={tokens[i % len(tokens)]}')
+            started = time.perf_counter()
+            connected, _ = await client.connect(timeout=60)
+            if connected and subscriptions[i] is not None:
+                await client.send_json_to({'action': 'set', **subscriptions[i]})
+                await client.receive_from(timeout=60)
+            connect_times.append(time.perf_counter() - started)
+            return client if connected else None
+
+        started = time.perf_counter()
+        for start in range(0, options['clients'], options['connect_batch']):
+            batch = range(start, min(start + options['connect_batch'], options['clients']))
+            clients.extend(await asyncio.gather(*(connect(i) for i in batch)))
+        connect_elapsed = time.perf_counter() - started
+        refused = clients.count(None)
+        clients = [client for client in clients if client is not None]
+        gc.collect()
+        rss_connected = rss_mb()
+
+        sent = {}
+        latencies = []
+        received = Counter()
+        frames = 0
+        last_arrival = time.perf_counter()
+
+        async def listen(client):
+            nonlocal frames, last_arrival
+            while True:
+                message = await client.receive_output(timeout=3600)
+                arrived = last_arrival = time.perf_counter()
+                frames += 1
+                # A regex instead of json.loads keeps the listeners cheap:
+                # they share the event loop with the server under test.
+                for seq in WRITE_SEQ.findall(message.get('text') or ''):
+                    seq = int(seq)
+                    latencies.append(arrived - sent[seq])
+                    received[seq] += 1
+
+        listeners_tasks = [asyncio.create_task(listen(client)) for client in clients]
+        writes = int(options['duration'] * options['rate'])
+        started = time.perf_counter()
+        for seq in range(writes):
+            await asyncio.sleep(max(0, started + seq / options['rate'] - time.perf_counter()))
+            product_id = product_ids[seq % len(product_ids)]
+            sent[seq] = time.perf_counter()
+            await database_sync_to_async(write_product)(product_id, seq)
+        write_elapsed = time.perf_counter() - started
+        # Drain: wait for the broadcaster to finish its last flush, then for
+        # the clients to work through their queues, so a loop running behind
+        # still has its backlog counted.
+        drain_until = time.perf_counter() + options['drain_timeout']
+        try:
+            await asyncio.wait_for(asyncio.to_thread(product_broadcaster.join), options['drain_timeout'])
+        except asyncio.TimeoutError:
+            pass
+        while time.perf_counter() < drain_until:
+            await asyncio.sleep(0.25)
+            if time.perf_counter() - last_arrival > 1:
+                break
+        elapsed = last_arrival - started
+
+        for task in listeners_tasks:
+            task.cancel()
+        await asyncio.gather(*listeners_tasks, return_exceptions=True)
+        for client in clients:
+            await client.disconnect()
+
+        # A write followed by another to the same product within one window
+        # is legitimately never sent; the last write to each must reach
+        # every client listening to that product.
+        final_writes = {product_ids[seq % len(product_ids)]: seq for seq in sent}
+        expected = sum(listeners[product_id] for product_id in final_writes)
+        arrived_final = sum(min(received[seq], listeners[product_id]) for product_id, seq in final_writes.items())
+        delivered = sum(received.values())
+        self.stdout.write(
+            f"{len(clients)} clients connected in {connect_elapsed:.1f}s "
+            f"({len(clients) / connect_elapsed:.0f}/s, p99 {percentile(connect_times, 99):.0f} ms)"
+            + (self.style.ERROR(f", {refused} refused") if refused else '')
+        )
+        self.stdout.write(
+            f"  memory: {rss_connected - rss_before:.1f} MB for the connections, "
+            f"{(rss_connected - rss_before) * 1024 / max(len(clients), 1):.1f} KB each"
+        )
+        self.stdout.write(
+            f"  writes: {writes} in {write_elapsed:.1f}s ({writes / write_elapsed:.1f}/s), "
+            f"{len(received)} delivered, {writes - len(received)} not sent separately "
+            f"(broadcast delay {delay * 1000:.0f} ms)"
+        )
+        self.stdout.write(
+            f"  deliveries: {delivered} product updates in {frames} frames, "
+            f"{delivered / elapsed:.0f} updates/s, {frames / elapsed:.0f} frames/s"
+        )
+        self.stdout.write(
+            f"  latency from save to client: p50 {percentile(latencies, 50):.0f} ms, "
+            f"p99 {percentile(latencies, 99):.0f} ms, max {percentile(latencies, 100):.0f} ms"
+            + (f", mean {statistics.fmean(latencies) * 1000:.0f} ms" if latencies else '')
+        )
+        style = self.style.SUCCESS if arrived_final == expected else self.style.ERROR
+        self.stdout.write(style(
+            f"  final state of every written product reached {arrived_final} of {expected} listening clients"
+        ))
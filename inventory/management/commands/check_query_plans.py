@@ -0,0 +1,52 @@
+# inventory/management/commands/check_query_plans.py
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from inventory.models import Product
+from inventory.queryplans import analyze, full_scans, hot_queries
+from inventory.synthetic import create_catalog, create_movements
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAINs the hot StockMovement queries on a large synthetic dataset (written inside a '
+        'transaction that is rolled back) and fails if any of them scans the whole table. '
+        'QueryPlanTests runs the same checks on a small dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movements', type=int, default=200_000)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--existing', action='store_true', help='Use the data already in the database.')
+        parser.add_argument('--show-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        failures = []
+        with transaction.atomic():
+            if not options['existing']:
+                rng = np.random.default_rng(options['seed'])
+                product_ids = create_catalog(options['products'], 10, rng)
+                create_movements(product_ids, options['movements'], options['days'], rng)
+            analyze()
+            product = Product.objects.filter(movements__isnull=False).order_by('-pk').first()
+            if product is None:
+                raise CommandError('No stock movements to plan against; drop --existing or seed some data.')
+            for name, run in hot_queries(product).items():
+                scanned, plans = full_scans(name, run)
+                if options['show_plans']:
+                    for sql, plan in plans:
+                        self.stdout.write(f'{name}:\n{sql}\n{plan}\n')
+                if scanned:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"FULL SCAN  {name} ({', '.join(sorted(scanned))})"))
+                else:
+                    self.stdout.write(f'ok         {name}')
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries scan a whole table: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS('All hot queries use indexes.'))
@@ -0,0 +1,22 @@
+# inventory/management/commands/compact_product_changes.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from inventory.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Compacts the product change log: drops entries superseded by a newer change to the same '
+        'product and entries older than the retention period. Run it periodically, e.g. daily.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Retention in days (default: PRODUCT_CHANGE_RETENTION_DAYS).')
+
+    def handle(self, *args, **options):
+        retention = timedelta(days=options['days']) if options['days'] is not None else None
+        deleted = compact_changes(retention)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change log entries.'))
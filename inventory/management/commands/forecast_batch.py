@@ -0,0 +1,38 @@
+# inventory/management/commands/forecast_batch.py
+
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from inventory.forecasts import max_forecast_processes, run_batch_forecast
+from inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Fits sales forecasts for the whole catalog in one pass: one query for all sales, '
+        'then model fits spread over a process pool. Only stale forecasts unless --all.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Refit every product with sales, not just stale ones.')
+        parser.add_argument(
+            '--processes', type=int,
+            help=f'Worker processes (default and maximum: FORECAST_MAX_PROCESSES, currently {max_forecast_processes()}).',
+        )
+        parser.add_argument('--chunk-size', type=int, default=25, help='Products per task sent to a worker.')
+
+    def handle(self, *args, **options):
+        products = Product.objects.all() if options['all'] else None
+        with tqdm(desc='Forecasting', unit='product', disable=options['verbosity'] == 0) as bar:
+            def progress(done, total):
+                bar.total = total
+                bar.update(done - bar.n)
+
+            report = run_batch_forecast(products, options['processes'], progress, options['chunk_size'])
+
+        for error in report.errors:
+            self.stdout.write(self.style.WARNING(f"Product {error['product_id']}: {error['error']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecasted {report.forecasted}, skipped {report.skipped} with too little history, "
+            f"failed {len(report.errors)}."
+        ))
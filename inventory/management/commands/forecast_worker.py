@@ -0,0 +1,41 @@
+# inventory/management/commands/forecast_worker.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from inventory.forecasts import refresh_forecast, stale_forecasts
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes product forecasts whose stored result predates the latest sale. '
+        'Runs until interrupted, or once with --once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the current backlog and exit.')
+        parser.add_argument('--interval', type=float, default=10, help='Seconds to sleep when nothing is stale.')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        failed = set()
+        while True:
+            close_old_connections()
+            product_ids = list(
+                stale_forecasts().exclude(pk__in=failed).order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            for product_id in product_ids:
+                try:
+                    refresh_forecast(product_id)
+                except Exception as e:
+                    # Skipped until the worker restarts, so one bad product cannot stall the rest.
+                    failed.add(product_id)
+                    self.stderr.write(f'Forecast for product {product_id} failed: {e}')
+            if product_ids:
+                self.stdout.write(f'Refreshed {len(product_ids)} forecasts.')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
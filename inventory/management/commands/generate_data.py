@@ -0,0 +1,88 @@
+# inventory/management/commands/generate_data.py
+
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from tqdm import tqdm
+
+from inventory.rollup import rebuild_sales_rollup
+from inventory.search import rebuild_search_index
+from inventory.synthetic import (
+    clear_generated, ensure_reference_data, generate_dataset, generated_products, plan_chunks,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates a synthetic catalog with stock history at load-test scale. The same --seed and '
+        'scale options always produce the same data, however many --processes share the work. '
+        'Rows are inserted chunk by chunk, so memory stays flat at any size. Unlike seed_data it '
+        'leaves existing data alone; its products have SKUs starting SYN-<seed>-.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10_000)
+        parser.add_argument('--movements-per-product', type=int, default=100,
+                            help='Average; best sellers get many times more.')
+        parser.add_argument('--years', type=float, default=2, help='Years of history.')
+        parser.add_argument('--end', help='Date the history runs up to, YYYY-MM-DD (default: today).')
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--suppliers', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Worker processes inserting chunks. SQLite serializes writers, so '
+                                 'this only pays off on PostgreSQL or MySQL.')
+        parser.add_argument('--clear', action='store_true', help='First delete data generated earlier with this seed.')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Do not rebuild the search index and daily sales rollup afterwards.')
+
+    def handle(self, *args, **options):
+        seed = options['seed']
+        if options['clear']:
+            self.stdout.write(f'Deleted {clear_generated(seed)} previously generated products.')
+        elif generated_products(seed).exists():
+            raise CommandError(f'Products generated with seed {seed} already exist; pass --clear to replace them.')
+
+        if options['end']:
+            end = datetime.strptime(options['end'], '%Y-%m-%d').replace(tzinfo=dt_timezone.utc)
+        else:
+            end = datetime.now(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        category_ids, supplier_ids = ensure_reference_data(options['categories'], options['suppliers'])
+        spec = {
+            'seed': seed,
+            'products': options['products'],
+            'movements_per_product': options['movements_per_product'],
+            'years': options['years'],
+            'end': end,
+            'category_ids': category_ids,
+            'supplier_ids': supplier_ids,
+            'user_ids': sorted(User.objects.values_list('pk', flat=True)),
+        }
+        chunks = len(plan_chunks(options['products'], options['movements_per_product']))
+        self.stdout.write(
+            f"Generating {options['products']:,} products, about "
+            f"{options['products'] * (options['movements_per_product'] + 1):,} movements, "
+            f"in {chunks} chunks on {min(options['processes'], chunks)} process(es)..."
+        )
+
+        started = time.perf_counter()
+        with tqdm(total=options['products'], unit='product', disable=options['verbosity'] == 0) as bar:
+            def progress(products, movements):
+                bar.update(products)
+
+            movements = generate_dataset(spec, options['processes'], progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted {options["products"]:,} products and {movements:,} movements in {elapsed:.1f}s '
+            f'({movements / elapsed:,.0f} movements/s).'
+        ))
+
+        if not options['skip_derived']:
+            self.stdout.write('Building search index...')
+            rebuild_search_index(generated_products(seed))
+            self.stdout.write('Building daily sales rollup...')
+            start = end - timedelta(days=options['years'] * 365 + 1)
+            rebuild_sales_rollup(start.date(), end.date())
+            self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s.'))
@@ -0,0 +1,36 @@
+# inventory/management/commands/import_products.py
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.importer import DEFAULT_BATCH_SIZE, detect_format, import_products, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Upserts products by SKU from a csv, json or ndjson file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'json', 'ndjson'])
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--user', help='Username recorded on the stock movements the import creates.')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"User '{options['user']}' not found.")
+
+        file_format = options['file_format'] or detect_format(options['path'])
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as f:
+                report = import_products(read_rows(f, file_format), user=user, batch_size=options['batch_size'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in report.errors:
+            self.stdout.write(self.style.WARNING(f"Row {error['row']} ({error['sku']}): {error['errors']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report.created}, updated {report.updated}, failed {len(report.errors)}."
+        ))
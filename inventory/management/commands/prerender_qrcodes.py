@@ -0,0 +1,55 @@
+# inventory/management/commands/prerender_qrcodes.py
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from inventory.cache import product_qr_data, qr_cache
+from inventory.labels import qr_png_many
+from inventory.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Renders the QR code of every product not yet in the on-disk QR cache (MEDIA_ROOT/qrcodes), '
+        'across worker processes, so no request has to render one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, help='Default: LABEL_MAX_PROCESSES, or one per CPU.')
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        missing = []
+        for pk in Product.objects.order_by('pk').values_list('pk', flat=True).iterator():
+            data = product_qr_data(pk)
+            digest = qr_cache.digest(data)
+            if not qr_cache.has(digest):
+                missing.append((digest, data))
+
+        size = options['chunk_size']
+        chunks = [missing[start:start + size] for start in range(0, len(missing), size)]
+        processes = options['processes'] or getattr(settings, 'LABEL_MAX_PROCESSES', 0) or os.cpu_count() or 1
+        processes = min(processes, len(chunks))
+        if processes <= 1:
+            for chunk in chunks:
+                self.store(qr_png_many(chunk))
+        else:
+            # spawn, like the forecast pool: workers only need inventory.labels.
+            with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+                for future in as_completed([pool.submit(qr_png_many, chunk) for chunk in chunks]):
+                    self.store(future.result())
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {len(missing)} QR codes on {max(processes, 1)} process(es) '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
+
+    def store(self, rendered):
+        for digest, png in rendered:
+            qr_cache.store(digest, png)
@@ -0,0 +1,62 @@
+# inventory/management/commands/profile_startup.py
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+HEAVY_MODULES = ('numpy', 'pandas', 'scipy', 'statsmodels', 'faker', 'tqdm', 'qrcode', 'PIL')
+
+# Runs in a fresh interpreter: what a Daphne or WSGI worker does before it
+# serves its first request.
+PROBE = '''
+import json, resource, sys, time
+started = time.perf_counter()
+import backend.asgi
+booted = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+routed = time.perf_counter()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'asgi_ms': (booted - started) * 1000,
+    'urls_ms': (routed - booted) * 1000,
+    'rss_mb': rss / (1024 * 1024 if sys.platform == 'darwin' else 1024),
+    'loaded': [name for name in %r if name in sys.modules],
+}))
+''' % (HEAVY_MODULES,)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures worker cold start: imports backend.asgi and loads the URLconf in fresh '
+        'interpreters, then reports import time, peak RSS and which heavy libraries were loaded.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        runs = []
+        for _ in range(options['runs']):
+            probe = subprocess.run(
+                [sys.executable, '-c', PROBE], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            if probe.returncode:
+                raise CommandError(f'Startup probe failed:\n{probe.stderr}')
+            runs.append(json.loads(probe.stdout.strip().splitlines()[-1]))
+
+        def median(key):
+            return statistics.median(run[key] for run in runs)
+
+        self.stdout.write(f"Median of {len(runs)} cold starts:")
+        self.stdout.write(f"  import backend.asgi  {median('asgi_ms'):8.1f} ms")
+        self.stdout.write(f"  load URLconf         {median('urls_ms'):8.1f} ms")
+        self.stdout.write(f"  peak RSS             {median('rss_mb'):8.1f} MB")
+        loaded = runs[-1]['loaded']
+        self.stdout.write(f"  heavy modules loaded: {', '.join(loaded) if loaded else 'none'}")
@@ -0,0 +1,38 @@
+# inventory/management/commands/rebuild_sales_rollup.py
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.rollup import find_drifted_days, rebuild_sales_rollup
+
+
+class Command(BaseCommand):
+    help = 'Backfills or repairs the daily sales rollup from the StockMovement table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days from this date (YYYY-MM-DD) onwards.')
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Compare per-day totals with the movement table and rebuild only the days that drifted.',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format.')
+
+        if not options['verify']:
+            written = rebuild_sales_rollup(since, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily sales rows.'))
+            return
+
+        drifted = find_drifted_days(since)
+        for day in drifted:
+            rebuild_sales_rollup(day, day, batch_size=options['batch_size'])
+            self.stdout.write(f'Rebuilt {day}.')
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted)} day(s) drifted from the movement table.'))
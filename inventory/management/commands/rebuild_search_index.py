@@ -0,0 +1,16 @@
+# inventory/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand
+
+from inventory.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the product full-text search index from the Product table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} products.'))
@@ -9,6 +9,8 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 from inventory.models import Supplier, Category, Product, StockMovement, ProductImage
+from inventory.rollup import rebuild_sales_rollup
+from inventory.search import rebuild_search_index
 from django.db import transaction
 from tqdm import tqdm
 
@@ -137,4 +139,10 @@ class Command(BaseCommand):
         
         Product.objects.bulk_update(products, ['quantity'])
 
+        self.stdout.write('Building search index...')
+        rebuild_search_index()
+
+        self.stdout.write('Building daily sales rollup...')
+        rebuild_sales_rollup()
+
         self.stdout.write(self.style.SUCCESS('Database successfully seeded from all data sources!'))
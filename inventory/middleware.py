@@ -4,13 +4,12 @@ from channels.db import database_sync_to_async
 
 @database_sync_to_async
 def get_user(token_key):
-    from rest_framework_simplejwt.tokens import AccessToken
-    from django.contrib.auth.models import User
+    from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+    from inventory.authentication import CachedJWTAuthentication
+    auth = CachedJWTAuthentication()
     try:
-        token = AccessToken(token_key)
-        user_id = token['user_id']
-        return User.objects.get(pk=user_id)
-    except Exception:
+        return auth.get_user(auth.get_validated_token(token_key))
+    except (InvalidToken, AuthenticationFailed):
         return AnonymousUser()
 
 class TokenAuthMiddleware(BaseMiddleware):
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:06
+
+import django.db.models.deletion
+from django.db import DatabaseError, migrations, models, transaction
+
+# The full-text structures as they were at this migration; inventory/search.py
+# queries them by these names.
+INDEX_TABLE = 'inventory_productsearchindex'
+FTS_TABLE = 'inventory_productsearch_fts'
+
+
+def create_structures(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX inventory_psi_document_tsv ON {INDEX_TABLE} "
+            f"USING GIN (to_tsvector('simple', document))"
+        )
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except DatabaseError:
+            return
+        schema_editor.execute(
+            f"CREATE INDEX inventory_psi_document_trgm ON {INDEX_TABLE} USING GIN (document gin_trgm_ops)"
+        )
+    elif vendor == 'mysql':
+        schema_editor.execute(f"ALTER TABLE {INDEX_TABLE} ADD FULLTEXT INDEX inventory_psi_document_ft (document)")
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(document, sku, "
+            f"content='{INDEX_TABLE}', content_rowid='product_id', prefix='2 3 4')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {INDEX_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, document, sku) VALUES (new.product_id, new.document, new.sku); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {INDEX_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document, sku) "
+            f"VALUES ('delete', old.product_id, old.document, old.sku); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {INDEX_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document, sku) "
+            f"VALUES ('delete', old.product_id, old.document, old.sku); "
+            f"INSERT INTO {FTS_TABLE}(rowid, document, sku) VALUES (new.product_id, new.document, new.sku); END"
+        )
+
+
+def drop_structures(apps, schema_editor):
+    # The MySQL FULLTEXT index goes with the table.
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS inventory_psi_document_trgm')
+        schema_editor.execute('DROP INDEX IF EXISTS inventory_psi_document_tsv')
+    elif vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def populate_index(apps, schema_editor):
+    Product = apps.get_model('inventory', 'Product')
+    ProductSearchIndex = apps.get_model('inventory', 'ProductSearchIndex')
+    rows = [
+        ProductSearchIndex(
+            product_id=product.pk,
+            document=' '.join(part for part in (product.name, product.sku, product.category.name) if part),
+            sku=product.sku.lower(),
+        )
+        for product in Product.objects.select_related('category').iterator(chunk_size=2000)
+    ]
+    ProductSearchIndex.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_merge_0002_create_admin_0009_alter_productimage_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchIndex',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_index', serialize=False, to='inventory.product')),
+                ('document', models.TextField()),
+                ('sku', models.CharField(db_index=True, max_length=100)),
+            ],
+        ),
+        migrations.RunPython(create_structures, drop_structures),
+        migrations.RunPython(populate_index, migrations.RunPython.noop),
+    ]
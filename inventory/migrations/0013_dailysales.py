@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rollup(apps, schema_editor):
+    StockMovement = apps.get_model('inventory', 'StockMovement')
+    DailySales = apps.get_model('inventory', 'DailySales')
+    rows = StockMovement.objects.filter(quantity_change__lt=0).annotate(day=TruncDate('timestamp')) \
+        .values('day', 'product_id').annotate(units=Sum('quantity_change'), count=Count('id')).order_by()
+    DailySales.objects.bulk_create(
+        (
+            DailySales(day=row['day'], product_id=row['product_id'], units_sold=-row['units'], sales_count=row['count'])
+            for row in rows.iterator(chunk_size=2000)
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_category_updated_at_product_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units_sold', models.PositiveIntegerField(default=0)),
+                ('sales_count', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='inventory.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily sales',
+                'indexes': [models.Index(fields=['product', 'day'], name='daily_sales_product_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'product'), name='daily_sales_day_product_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ]
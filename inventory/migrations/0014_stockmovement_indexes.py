@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_dailysales'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['product', 'timestamp'], name='movement_product_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['timestamp', 'id'], name='movement_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(condition=models.Q(('quantity_change__lt', 0)), fields=['timestamp', 'product', 'quantity_change'], name='movement_sales_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(condition=models.Q(('quantity_change__lt', 0)), fields=['product', 'timestamp', 'quantity_change'], name='movement_product_sales_idx'),
+        ),
+    ]
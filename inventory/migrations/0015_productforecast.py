@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_stockmovement_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductForecast',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stored_forecast', serialize=False, to='inventory.product')),
+                ('last_sale_id', models.BigIntegerField(null=True)),
+                ('data', models.JSONField(null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
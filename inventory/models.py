@@ -14,6 +14,7 @@ class Supplier(models.Model):
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     image_url = models.URLField(max_length=500, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Categories" 
@@ -33,6 +34,11 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='product_updated_at_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.sku})"
     
@@ -43,6 +49,25 @@ class StockMovement(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     timestamp = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # Movement list per product, newest first.
+            models.Index(fields=['product', 'timestamp'], name='movement_product_time_idx'),
+            # Unfiltered list, keyset pagination and exports.
+            models.Index(fields=['timestamp', 'id'], name='movement_time_idx'),
+            # Sales only (quantity_change < 0): analytics windows and rollup
+            # rebuilds, and per-product sales history for forecasts. The
+            # trailing columns let those queries skip the table.
+            models.Index(
+                fields=['timestamp', 'product', 'quantity_change'], name='movement_sales_time_idx',
+                condition=models.Q(quantity_change__lt=0),
+            ),
+            models.Index(
+                fields=['product', 'timestamp', 'quantity_change'], name='movement_product_sales_idx',
+                condition=models.Q(quantity_change__lt=0),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.product.name}: {self.quantity_change} on {self.timestamp}"
     
@@ -52,3 +77,68 @@ class ProductImage(models.Model):
 
     def __str__(self):
         return f"Image for {self.product.name}"
+
+class ProductSearchIndex(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='search_index')
+    document = models.TextField()
+    sku = models.CharField(max_length=100, db_index=True)
+
+    def __str__(self):
+        return f"Search index for {self.product_id}"
+
+class DailySales(models.Model):
+    """
+    Sales (negative stock movements) rolled up per product per day. Kept
+    current by inventory.rollup as movements are written; revenue and
+    category are joined from Product at read time, like the raw queries.
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+    units_sold = models.PositiveIntegerField(default=0)
+    sales_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Daily sales"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='daily_sales_day_product_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'day'], name='daily_sales_product_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.day}: {self.units_sold}"
+
+class ProductForecast(models.Model):
+    """
+    Last computed sales forecast for a product, tagged with the newest sale
+    movement it was fitted on. ``data`` is None when the history was too
+    short or the model failed.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='stored_forecast')
+    last_sale_id = models.BigIntegerField(null=True)
+    data = models.JSONField(null=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Forecast for {self.product_id} at sale {self.last_sale_id}"
+
+class ProductChange(models.Model):
+    """
+    One row per product write, numbered by ``seq``, so reconnecting clients
+    can fetch only what changed after the last ``seq`` they saw. Not a
+    foreign key: deletions are logged too. See inventory/changes.py.
+    """
+    seq = models.BigAutoField(primary_key=True)
+    product_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product_id', 'seq'], name='product_change_product_idx'),
+            models.Index(fields=['changed_at'], name='product_change_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"Change {self.seq} to product {self.product_id}"
@@ -0,0 +1,186 @@
+# inventory/pagination.py
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Returns the planner's row estimate for ``queryset`` instead of running a
+    COUNT(*). Backends without a usable estimate fall back to an exact count.
+    """
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    if connection.vendor not in ('postgresql', 'mysql'):
+        return queryset.count()
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+
+        cursor.execute('EXPLAIN ' + sql, params)
+        columns = [col[0].lower() for col in cursor.description]
+        row = dict(zip(columns, cursor.fetchone()))
+        filtered = float(row.get('filtered') or 100)
+        return int((row.get('rows') or 0) * filtered / 100)
+
+
+class KeysetPaginationMixin:
+    """
+    Opt-in keyset (seek) pagination on top of a page-number paginator.
+
+    Requests without a ``cursor`` parameter are paginated exactly like the
+    parent class. Passing ``?cursor=`` (empty for the first page) switches to
+    keyset mode: rows are ordered on a unique column tuple and each page is a
+    ``WHERE (a, b) > (x, y) LIMIT n`` seek, so there is no OFFSET and no
+    COUNT(*), and pages stay stable while new rows are inserted.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    keyset_ordering_query_param = 'cursor_order'
+    keyset_orderings = {'id': ('id',)}
+    default_keyset_ordering = 'id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    keyset = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.keyset = False
+            return super().paginate_queryset(queryset, request, view)
+
+        self.keyset = True
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.keyset_page_size = self.get_page_size(request)
+        self.ordering_name, values, reverse = self.decode_cursor(request, queryset.model)
+        self.ordering = self.keyset_orderings[self.ordering_name]
+        self.count = self.get_keyset_count(queryset, request)
+
+        ordering = self._invert(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, values))
+
+        rows = list(queryset[:self.keyset_page_size + 1])
+        has_more = len(rows) > self.keyset_page_size
+        rows = rows[:self.keyset_page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+
+        self.page_rows = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
+        payload = {}
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_is_approximate'] = self.count_mode == 'approx'
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page_rows:
+            return None
+        cursor = self.encode_cursor(self.page_rows[-1], reverse=False)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_rows:
+            return None
+        cursor = self.encode_cursor(self.page_rows[0], reverse=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_keyset_count(self, queryset, request):
+        self.count_mode = request.query_params.get(self.count_query_param)
+        if self.count_mode == 'approx':
+            return estimate_count(queryset)
+        if self.count_mode == 'exact':
+            return queryset.count()
+        return None
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            name = request.query_params.get(
+                self.keyset_ordering_query_param, self.default_keyset_ordering
+            )
+            if name not in self.keyset_orderings:
+                raise NotFound(self.invalid_cursor_message)
+            return name, None, False
+
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            name, values, reverse = payload['o'], payload['v'], bool(payload['r'])
+            fields = self.keyset_orderings[name]
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            # Parsed here so a forged value is a 404, not an error in the seek filter.
+            values = [self._parse(model, field, value) for field, value in zip(fields, values)]
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return name, values, reverse
+
+    def encode_cursor(self, row, reverse):
+        values = [self._jsonable(getattr(row, field.lstrip('-'))) for field in self.ordering]
+        payload = json.dumps({'o': self.ordering_name, 'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def _parse(model, field, value):
+        if value is None:
+            raise ValueError
+        return model._meta.get_field(field.lstrip('-')).to_python(value)
+
+    @staticmethod
+    def _jsonable(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    @staticmethod
+    def _invert(ordering):
+        return tuple(field[1:] if field.startswith('-') else '-' + field for field in ordering)
+
+    @staticmethod
+    def _seek_filter(ordering, values):
+        # (a, b) > (x, y) expands to a > x OR (a = x AND b > y). The leading
+        # a >= x conjunct gives the planner an index range to start from.
+        first = ordering[0]
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]})
+        seek = Q()
+        for i, field in enumerate(ordering):
+            clause = Q(**{f"{field.lstrip('-')}__{'lt' if field.startswith('-') else 'gt'}": values[i]})
+            for prev_field, prev_value in zip(ordering[:i], values):
+                clause &= Q(**{prev_field.lstrip('-'): prev_value})
+            seek |= clause
+        return bound & seek
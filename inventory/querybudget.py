@@ -0,0 +1,114 @@
+# inventory/querybudget.py
+
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+
+class QueryStats:
+    """Per-endpoint query counts, keyed by ``"<METHOD> <view_name>"``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, endpoint, count):
+        with self._lock:
+            entry = self._stats.setdefault(endpoint, {'requests': 0, 'queries': 0, 'max': 0, 'last': 0})
+            entry['requests'] += 1
+            entry['queries'] += count
+            entry['last'] = count
+            entry['max'] = max(entry['max'], count)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: dict(entry, mean=entry['queries'] / entry['requests'])
+                for endpoint, entry in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+query_stats = QueryStats()
+
+
+def get_budget(method, view_name):
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    return budgets.get(f"{method} {view_name}", budgets.get(view_name))
+
+
+@contextmanager
+def query_budget(max_queries, label='block'):
+    """
+    Fails with ``QueryBudgetExceeded`` if the wrapped block runs more than
+    ``max_queries`` statements on the default connection::
+
+        with query_budget(4, 'product-list'):
+            client.get('/api/products/?page_size=1000')
+    """
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+    if counter.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{label} ran {counter.count} queries, budget is {max_queries}:\n" + '\n'.join(counter.statements)
+        )
+
+
+class QueryBudgetMiddleware:
+    """
+    Counts the queries each request runs and records them in ``query_stats``.
+
+    Budgets come from ``settings.QUERY_BUDGETS``, keyed by URL name or by
+    ``"<METHOD> <URL name>"`` where writes need their own limit.
+    Going over budget logs a warning, or raises ``QueryBudgetExceeded`` when
+    ``settings.QUERY_BUDGET_STRICT`` is on, which is the default under
+    ``manage.py test`` so N+1 regressions fail the suite.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        if match is None or not match.view_name:
+            return response
+
+        query_stats.record(f"{request.method} {match.view_name}", counter.count)
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(counter.count)
+
+        budget = get_budget(request.method, match.view_name)
+        if budget is not None and counter.count > budget:
+            message = f"{request.method} {request.path} ({match.view_name}) ran {counter.count} queries, budget is {budget}"
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message + ':\n' + '\n'.join(counter.statements))
+            logger.warning(message)
+        return response
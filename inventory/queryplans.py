@@ -0,0 +1,125 @@
+# inventory/queryplans.py
+
+# EXPLAIN checks that the hot StockMovement queries are served from indexes,
+# on PostgreSQL, MySQL and SQLite. Run by QueryPlanTests in inventory/tests.py
+# and by `manage.py check_query_plans` against a large dataset.
+
+import json
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import Product, StockMovement
+from .rollup import SalesWindow, aggregate_movements
+from .views import analytics_watermark
+
+WATCHED_TABLES = {StockMovement._meta.db_table}
+
+# Paginated lists may walk an index from one end, since LIMIT stops them
+# early, as long as that index also provides the ORDER BY.
+ORDERED_SCANS = {'movement list, newest first'}
+
+
+def hot_queries(product):
+    today = timezone.localdate()
+    movements = StockMovement.objects.select_related('user')
+    forecast_history = StockMovement.objects.filter(product_id=product.pk, quantity_change__lt=0).order_by('timestamp')
+    return {
+        'analytics watermark, 30 days': lambda: analytics_watermark(30),
+        'top-products watermark, 7 days, one category': lambda: analytics_watermark(7, product.category_id),
+        'analytics window, partial first day': lambda: SalesWindow(timezone.now() - timedelta(days=30)).boundary_rows,
+        'sales rollup rebuild, one day': lambda: list(aggregate_movements(today, today)),
+        'forecast sales history': lambda: list(forecast_history.values('timestamp', 'quantity_change')),
+        'movement list, one product': lambda: list(movements.filter(product_id=product.pk).order_by('-timestamp', '-id')[:50]),
+        'movement list, newest first': lambda: list(movements.order_by('-timestamp', '-id')[:50]),
+        'product detail ETag': lambda: Product.objects.filter(pk=product.pk)
+            .annotate(last_movement=Max('movements__id')).values_list('updated_at', 'last_movement').first(),
+    }
+
+
+def _postgres_plan(cursor, sql):
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+    plan = cursor.fetchone()[0]
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    table_scans, index_walks, sorted_ = set(), set(), False
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        relation = node.get('Relation Name')
+        if node['Node Type'] == 'Seq Scan':
+            table_scans.add(relation)
+        elif node['Node Type'] in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in node:
+            index_walks.add(relation)
+        elif node['Node Type'] in ('Sort', 'Incremental Sort'):
+            sorted_ = True
+        nodes.extend(node.get('Plans', []))
+    return json.dumps(plan, indent=2), table_scans, index_walks, sorted_
+
+
+def _mysql_plan(cursor, sql):
+    cursor.execute('EXPLAIN ' + sql)
+    columns = [column[0] for column in cursor.description]
+    rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    return (
+        '\n'.join(map(str, rows)),
+        {row['table'] for row in rows if row['type'] == 'ALL'},
+        {row['table'] for row in rows if row['type'] == 'index'},
+        any('filesort' in (row.get('Extra') or '') for row in rows),
+    )
+
+
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?( USING (?:COVERING )?INDEX \w+)?$')
+
+
+def _sqlite_plan(cursor, sql):
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+    details = [row[-1] for row in cursor.fetchall()]
+    table_scans, index_walks = set(), set()
+    for match in filter(None, map(SQLITE_SCAN.match, details)):
+        (index_walks if match.group(2) else table_scans).add(match.group(1))
+    return '\n'.join(details), table_scans, index_walks, 'USE TEMP B-TREE FOR ORDER BY' in details
+
+
+def explain(sql):
+    """
+    Returns ``(plan_text, table_scans, index_walks, sorted)``: tables read in
+    full, tables read through a whole index without a search condition, and
+    whether the result needed a sort step.
+    """
+    planners = {'postgresql': _postgres_plan, 'mysql': _mysql_plan}
+    with connection.cursor() as cursor:
+        return planners.get(connection.vendor, _sqlite_plan)(cursor, sql)
+
+
+def analyze():
+    # Fresh statistics, so the planner sees the table's real size.
+    # MySQL's ANALYZE TABLE would commit the transaction, so skip it there.
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'ANALYZE {StockMovement._meta.db_table}')
+        elif connection.vendor == 'sqlite':
+            cursor.execute('ANALYZE')
+
+
+def full_scans(name, run):
+    """
+    Runs the hot query ``name`` and EXPLAINs what it sent. Returns the
+    watched tables it reads in full, and ``(sql, plan_text)`` per query.
+    """
+    with CaptureQueriesContext(connection) as captured:
+        run()
+    scanned, plans = set(), []
+    for query in captured.captured_queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT') or not any(table in sql for table in WATCHED_TABLES):
+            continue
+        plan, table_scans, index_walks, sorted_ = explain(sql)
+        if name not in ORDERED_SCANS or sorted_:
+            table_scans |= index_walks
+        scanned |= table_scans & WATCHED_TABLES
+        plans.append((sql, plan))
+    return scanned, plans
@@ -0,0 +1,212 @@
+# inventory/rollup.py
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .forecasts import schedule_forecasts
+from .models import DailySales, StockMovement
+
+REBUILD_BATCH_SIZE = 2000
+
+ROLLUP_REVENUE = Sum(F('units_sold') * F('product__sale_price'), output_field=DecimalField())
+
+
+def record_movements(movements):
+    """
+    Adds sales (negative movements) to their product's DailySales row and,
+    once the transaction commits, queues the products' forecasts for
+    recomputation. Call it inside the transaction that writes the movements
+    so the rollup and the ledger commit together; ``StockMovement.objects.create``
+    is covered by a post_save receiver, bulk_create callers must call this
+    themselves.
+    """
+    increments = defaultdict(lambda: [0, 0])
+    for movement in movements:
+        if movement.quantity_change < 0:
+            entry = increments[(timezone.localdate(movement.timestamp), movement.product_id)]
+            entry[0] -= movement.quantity_change
+            entry[1] += 1
+    if not increments:
+        return
+    sold = {product_id for _, product_id in increments}
+    transaction.on_commit(lambda: schedule_forecasts(sold))
+
+    if len(increments) == 1:
+        [((day, product_id), (units, count))] = increments.items()
+        rows = DailySales.objects.filter(day=day, product_id=product_id)
+        increment = {'units_sold': F('units_sold') + units, 'sales_count': F('sales_count') + count}
+        if not rows.update(**increment):
+            # INSERT ... ON CONFLICT DO NOTHING, so a concurrent first sale
+            # of the day cannot fail this transaction.
+            DailySales.objects.bulk_create([DailySales(day=day, product_id=product_id)], ignore_conflicts=True)
+            rows.update(**increment)
+        return
+
+    # Three statements for any number of (day, product) pairs: create the
+    # missing rows, lock them all, then write the new totals back.
+    DailySales.objects.bulk_create(
+        [DailySales(day=day, product_id=product_id) for day, product_id in increments], ignore_conflicts=True
+    )
+    rows = DailySales.objects.select_for_update().filter(
+        day__in={day for day, _ in increments}, product_id__in={product_id for _, product_id in increments}
+    ).order_by('pk')
+    changed = []
+    for row in rows:
+        entry = increments.get((row.day, row.product_id))
+        if entry:
+            row.units_sold += entry[0]
+            row.sales_count += entry[1]
+            changed.append(row)
+    DailySales.objects.bulk_update(changed, ['units_sold', 'sales_count'])
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def aggregate_movements(start_day=None, end_day=None):
+    """Yields unsaved DailySales rows computed from the raw movement table."""
+    movements = StockMovement.objects.filter(quantity_change__lt=0)
+    if start_day is not None:
+        movements = movements.filter(timestamp__gte=_day_start(start_day))
+    if end_day is not None:
+        movements = movements.filter(timestamp__lt=_day_start(end_day + timedelta(days=1)))
+    rows = movements.annotate(day=TruncDate('timestamp')).values('day', 'product_id') \
+        .annotate(units=Sum('quantity_change'), count=Count('id')).order_by()
+    for row in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        yield DailySales(day=row['day'], product_id=row['product_id'], units_sold=-row['units'], sales_count=row['count'])
+
+
+def rebuild_sales_rollup(start_day=None, end_day=None, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recomputes DailySales for ``start_day``..``end_day`` inclusive (all days
+    when omitted) from the movement table. Returns the number of rows written.
+    """
+    written = 0
+    with transaction.atomic():
+        stale = DailySales.objects.all()
+        if start_day is not None:
+            stale = stale.filter(day__gte=start_day)
+        if end_day is not None:
+            stale = stale.filter(day__lte=end_day)
+        stale.delete()
+
+        batch = []
+        for row in aggregate_movements(start_day, end_day):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                DailySales.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            DailySales.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def find_drifted_days(start_day=None):
+    """Days whose rolled-up totals no longer match the movement table."""
+    expected = {}
+    for row in aggregate_movements(start_day):
+        totals = expected.setdefault(row.day, [0, 0])
+        totals[0] += row.units_sold
+        totals[1] += row.sales_count
+
+    stored = DailySales.objects.all()
+    if start_day is not None:
+        stored = stored.filter(day__gte=start_day)
+    actual = {
+        row['day']: [row['units'], row['count']]
+        for row in stored.values('day').annotate(units=Sum('units_sold'), count=Sum('sales_count')).order_by()
+    }
+    return sorted(day for day in expected.keys() | actual.keys() if expected.get(day) != actual.get(day))
+
+
+class SalesWindow:
+    """
+    Sales since ``start`` (all time when None), optionally for one category.
+
+    Whole days are read from DailySales. A window starting mid-day also
+    reads that first partial day from the raw movements, once, so results
+    match an aggregate over StockMovement exactly while the cost grows with
+    the number of days and products rather than the number of movements.
+    """
+
+    def __init__(self, start=None, category_id=None):
+        self.rollup = DailySales.objects.all()
+        self.boundary = None
+        self.boundary_day = None
+        if start is not None:
+            start = timezone.localtime(start)
+            first_full_day = start.date()
+            if start != _day_start(first_full_day):
+                self.boundary_day = first_full_day
+                first_full_day += timedelta(days=1)
+                self.boundary = StockMovement.objects.filter(
+                    quantity_change__lt=0, timestamp__gte=start, timestamp__lt=_day_start(first_full_day)
+                )
+            self.rollup = self.rollup.filter(day__gte=first_full_day)
+        if category_id:
+            self.rollup = self.rollup.filter(product__category_id=category_id)
+            if self.boundary is not None:
+                self.boundary = self.boundary.filter(product__category_id=category_id)
+
+    @cached_property
+    def boundary_rows(self):
+        if self.boundary is None:
+            return []
+        return list(
+            self.boundary.values('product_id', 'product__name', 'product__category__name', 'product__sale_price')
+            .annotate(units=Sum('quantity_change') * -1).order_by()
+        )
+
+    def sales_trend(self):
+        trend = []
+        if self.boundary_rows:
+            revenue = sum(row['units'] * row['product__sale_price'] for row in self.boundary_rows)
+            trend.append({'day': self.boundary_day, 'total_revenue': revenue})
+        trend += self.rollup.values('day').annotate(total_revenue=ROLLUP_REVENUE).order_by('day')
+        return trend
+
+    def top_selling_products(self, limit=5):
+        rows = self.rollup.values('product__name').annotate(units=Sum('units_sold'))
+        if not self.boundary_rows:
+            return [
+                {'product__name': row['product__name'], 'units_sold': row['units']}
+                for row in rows.order_by('-units')[:limit]
+            ]
+        units = defaultdict(int)
+        for row in list(rows) + self.boundary_rows:
+            units[row['product__name']] += row['units']
+        ranked = sorted(units.items(), key=lambda item: -item[1])[:limit]
+        return [{'product__name': name, 'units_sold': total} for name, total in ranked]
+
+    def revenue_by_category(self):
+        rows = self.rollup.values('product__category__name').annotate(total_revenue=ROLLUP_REVENUE)
+        if not self.boundary_rows:
+            return list(rows.order_by('-total_revenue'))
+        revenue = defaultdict(int)
+        for row in rows:
+            revenue[row['product__category__name']] += row['total_revenue']
+        for row in self.boundary_rows:
+            revenue[row['product__category__name']] += row['units'] * row['product__sale_price']
+        ranked = sorted(revenue.items(), key=lambda item: -item[1])
+        return [{'product__category__name': name, 'total_revenue': total} for name, total in ranked]
+
+    def category_distribution(self):
+        rows = self.rollup.values('product__category__name')
+        if not self.boundary_rows:
+            return list(rows.annotate(count=Count('product', distinct=True)).order_by('-count'))
+        products = defaultdict(set)
+        for name, product_id in rows.values_list('product__category__name', 'product_id').distinct():
+            products[name].add(product_id)
+        for row in self.boundary_rows:
+            products[row['product__category__name']].add(row['product_id'])
+        ranked = sorted(products.items(), key=lambda item: -len(item[1]))
+        return [{'product__category__name': name, 'count': len(ids)} for name, ids in ranked]
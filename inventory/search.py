@@ -0,0 +1,173 @@
+# inventory/search.py
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from .models import Product, ProductSearchIndex
+
+# Created by migration 0011.
+INDEX_TABLE = 'inventory_productsearchindex'
+FTS_TABLE = 'inventory_productsearch_fts'
+SKU_MATCH_BOOST = 10.0
+
+_capabilities = {}
+
+
+def build_document(product):
+    return ' '.join(part for part in (product.name, product.sku, product.category.name) if part)
+
+
+def update_search_index(product):
+    fields = {'document': build_document(product), 'sku': product.sku.lower()}
+    if not ProductSearchIndex.objects.filter(product_id=product.pk).update(**fields):
+        ProductSearchIndex.objects.create(product_id=product.pk, **fields)
+
+
+def rebuild_search_index(queryset=None, batch_size=2000):
+    if queryset is None:
+        queryset = Product.objects.all()
+    queryset = queryset.select_related('category').order_by('pk')
+
+    indexed = 0
+    batch = []
+    for product in queryset.iterator(chunk_size=batch_size):
+        batch.append(ProductSearchIndex(
+            product_id=product.pk, document=build_document(product), sku=product.sku.lower()
+        ))
+        if len(batch) >= batch_size:
+            indexed += _write_batch(batch)
+            batch = []
+    if batch:
+        indexed += _write_batch(batch)
+    return indexed
+
+
+def _write_batch(batch):
+    ProductSearchIndex.objects.bulk_create(
+        batch, update_conflicts=True, unique_fields=['product'], update_fields=['document', 'sku'],
+    )
+    return len(batch)
+
+
+def get_capabilities():
+    key = connection.alias
+    if key not in _capabilities:
+        fts = trigram = False
+        min_token = 1
+        if connection.vendor == 'sqlite':
+            fts = FTS_TABLE in connection.introspection.table_names()
+        elif connection.vendor == 'postgresql':
+            fts = True
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                trigram = cursor.fetchone() is not None
+        elif connection.vendor == 'mysql':
+            fts = True
+            # InnoDB leaves shorter words out of FULLTEXT indexes.
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT @@innodb_ft_min_token_size')
+                min_token = int(cursor.fetchone()[0])
+        _capabilities[key] = {'fts': fts, 'trigram': trigram, 'min_token': min_token}
+    return _capabilities[key]
+
+
+def _tokens(terms):
+    tokens = []
+    for term in terms:
+        tokens.extend(re.findall(r'\w+', term.lower()))
+    return tokens
+
+
+def search_products(queryset, terms):
+    """
+    Filters ``queryset`` to products matching every search term (prefix
+    matching on words and on the SKU) and orders it by relevance as
+    ``search_rank``. Falls back to ``icontains`` on the index document when
+    the database has no full-text support.
+    """
+    tokens = _tokens(terms)
+    if not tokens:
+        return queryset
+
+    sku_prefix = ''.join(terms).lower().replace('%', '').replace('_', '') + '%'
+    product_pk = f'{connection.ops.quote_name(Product._meta.db_table)}.{connection.ops.quote_name("id")}'
+    capabilities = get_capabilities()
+
+    if connection.vendor == 'postgresql' and capabilities['fts']:
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        raw_query = ' '.join(tokens)
+        match_sql = (
+            f"SELECT product_id FROM {INDEX_TABLE} WHERE "
+            f"to_tsvector('simple', document) @@ to_tsquery('simple', %s) OR sku LIKE %s"
+        )
+        match_params = [tsquery, sku_prefix]
+        rank_sql = (
+            f"SELECT ts_rank(to_tsvector('simple', document), to_tsquery('simple', %s))"
+            f" + CASE WHEN sku LIKE %s THEN {SKU_MATCH_BOOST} ELSE 0 END"
+        )
+        rank_params = [tsquery, sku_prefix]
+        if capabilities['trigram']:
+            match_sql += ' OR document %%> %s'
+            match_params.append(raw_query)
+            rank_sql += ' + word_similarity(%s, document)'
+            rank_params.append(raw_query)
+        rank_sql += f' FROM {INDEX_TABLE} WHERE product_id = {product_pk}'
+    elif connection.vendor == 'mysql' and capabilities['fts']:
+        # Words shorter than the FULLTEXT minimum are not in the index, so
+        # those are matched with LIKE, as icontains did before the index.
+        indexed = [token for token in tokens if len(token) >= capabilities['min_token']]
+        short = [token for token in tokens if len(token) < capabilities['min_token']]
+        conditions, params = [], []
+        rank_sql, rank_params = 'SELECT 0', []
+        if indexed:
+            boolean_query = ' '.join(f'+{token}*' for token in indexed)
+            conditions.append('MATCH(document) AGAINST (%s IN BOOLEAN MODE)')
+            params.append(boolean_query)
+            rank_sql, rank_params = 'SELECT MATCH(document) AGAINST (%s IN BOOLEAN MODE)', [boolean_query]
+        for token in short:
+            conditions.append('document LIKE %s')
+            params.append('%' + token.replace('_', '\\_') + '%')
+        match_sql = f"SELECT product_id FROM {INDEX_TABLE} WHERE ({' AND '.join(conditions)}) OR sku LIKE %s"
+        match_params = params + [sku_prefix]
+        rank_sql += (
+            f" + CASE WHEN sku LIKE %s THEN {SKU_MATCH_BOOST} ELSE 0 END"
+            f" FROM {INDEX_TABLE} WHERE product_id = {product_pk}"
+        )
+        rank_params.append(sku_prefix)
+    elif connection.vendor == 'sqlite' and capabilities['fts']:
+        fts_query = ' '.join(f'"{token}"*' for token in tokens)
+        match_sql = (
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"UNION SELECT product_id FROM {INDEX_TABLE} WHERE sku LIKE %s"
+        )
+        match_params = [fts_query, sku_prefix]
+        rank_sql = (
+            f"SELECT COALESCE((SELECT -rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = i.product_id), 0)"
+            f" + CASE WHEN i.sku LIKE %s THEN {SKU_MATCH_BOOST} ELSE 0 END"
+            f" FROM {INDEX_TABLE} i WHERE i.product_id = {product_pk}"
+        )
+        rank_params = [fts_query, sku_prefix]
+    else:
+        condition = Q(search_index__sku__startswith=sku_prefix[:-1])
+        words = Q()
+        for token in tokens:
+            words &= Q(search_index__document__icontains=token)
+        return queryset.filter(condition | words)
+
+    return queryset.filter(pk__in=RawSQL(match_sql, match_params)).annotate(
+        search_rank=RawSQL(rank_sql, rank_params)
+    ).order_by('-search_rank', 'pk')
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """Drop-in replacement for ``SearchFilter`` backed by ``ProductSearchIndex``."""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search_products(queryset, terms)
@@ -3,10 +3,12 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
 from .models import Supplier, Category, Product, StockMovement
-from .tasks import get_sales_forecast
+from .forecasts import get_forecast
 from .models import ProductImage
 from django.contrib.auth.models import Group
 from django.conf import settings
+from django.db import models
+from .cache import product_cache
 
 class ProductImageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -23,7 +25,38 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name', 'image_url']
 
-class ProductSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Drops output fields the client did not ask for. ``context['fields']``
+    limits the output to the named fields; names in ``expandable_fields``
+    are left out unless listed in ``context['expand']``.
+    """
+    expandable_fields = ()
+
+    @property
+    def is_sparse(self):
+        return bool(self.context.get('fields')) or bool(self.expandable_fields)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields')
+        expand = self.context.get('expand') or ()
+        for name in list(fields):
+            if fields[name].write_only:
+                continue
+            if (requested and name not in requested) or (name in self.expandable_fields and name not in expand):
+                del fields[name]
+        return fields
+
+class CachedProductListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        products = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if self.child.is_sparse:
+            return [self.child.to_representation(product) for product in products]
+        cached = product_cache.get_many(products)
+        return [self.child.render(product, cached.get(product.pk)) for product in products]
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     supplier = SupplierSerializer(read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
@@ -43,13 +76,51 @@ class ProductSerializer(serializers.ModelSerializer):
             'sale_price', 'quantity', 'reorder_point', 'category_id', 'supplier_id',
             'forecast', 'images' 
         ]
-    
+        list_serializer_class = CachedProductListSerializer
+
+    def to_representation(self, instance):
+        if self.is_sparse:
+            return super().to_representation(instance)
+        return self.render(instance, product_cache.get(instance))
+
+    def render(self, instance, cached):
+        # The cached copy never holds a forecast; it is only computed on retrieve.
+        if cached is None:
+            data = super().to_representation(instance)
+            product_cache.set(instance, {**data, 'forecast': None})
+            return data
+        cached['forecast'] = self.get_forecast(instance)
+        return cached
+
     def get_forecast(self, obj):
         view = self.context.get('view', None)
         if view and view.action == 'retrieve':
-            return get_sales_forecast(obj.id)
+            return get_forecast(obj.id)
         return None 
 
+class ProductCompactSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Flat product card: no nested objects unless requested with ``?expand=``."""
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    image = serializers.SerializerMethodField()
+    category = CategorySerializer(read_only=True)
+    supplier = SupplierSerializer(read_only=True)
+    images = ProductImageSerializer(many=True, read_only=True)
+
+    expandable_fields = ('category', 'supplier', 'images')
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'name', 'sku', 'category_name', 'quantity', 'sale_price',
+            'reorder_point', 'image', 'category', 'supplier', 'images'
+        ]
+
+    def get_image(self, obj):
+        images = getattr(obj, 'cover_images', None)
+        if images is None:
+            images = list(obj.images.all())
+        return images[0].image if images else None
+
 class StockMovementSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
     
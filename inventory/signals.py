@@ -1,24 +1,97 @@
 # inventory/signals.py
 
-from django.db.models.signals import post_save
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.db import transaction
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.utils import timezone
 
-from .models import Product
-from .serializers import ProductSerializer
+from .broadcast import product_broadcaster
+from .changes import record_product_changes
+from .models import Product, Category, Supplier, ProductImage, StockMovement
+from .cache import product_cache, user_cache
+from .search import update_search_index, rebuild_search_index
+from .rollup import record_movements
+
+SEARCHABLE_FIELDS = {'name', 'sku', 'category'}
 
 @receiver(post_save, sender=Product)
-def broadcast_product_update(sender, instance, **kwargs):
-    product = Product.objects.select_related('category', 'supplier').get(pk=instance.pk)
-    
-    channel_layer = get_channel_layer()
-    serializer = ProductSerializer(product)
-    
-    async_to_sync(channel_layer.group_send)(
-        'products_group',
-        {
-            'type': 'product_update',
-            'product': serializer.data
-        }
-    )
+def broadcast_product_update(sender, instance, update_fields=None, **kwargs):
+    product_cache.invalidate(instance.pk)
+    if update_fields is None or SEARCHABLE_FIELDS.intersection(update_fields):
+        update_search_index(instance)
+    record_product_changes([instance.pk])
+    broadcast_products_update([instance.pk])
+
+def broadcast_products_update(product_ids):
+    # Clients only hear about committed state, and the request never waits
+    # on the channel layer; see inventory/broadcast.py.
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: product_broadcaster.queue(product_ids))
+
+@receiver(post_delete, sender=Product)
+def invalidate_deleted_product(sender, instance, **kwargs):
+    product_cache.invalidate(instance.pk)
+    record_product_changes([instance.pk], deleted=True)
+
+def touch_products(queryset):
+    # Related rows are part of the product payload: bumping updated_at keeps
+    # cache versions and ETag validators in step with them.
+    product_ids = list(queryset.values_list('pk', flat=True))
+    if product_ids:
+        Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+        product_cache.invalidate(*product_ids)
+        record_product_changes(product_ids)
+
+@receiver(post_save, sender=Category)
+def refresh_category_products(sender, instance, created, **kwargs):
+    if not created:
+        products = Product.objects.filter(category_id=instance.pk)
+        rebuild_search_index(products)
+        touch_products(products)
+
+@receiver(post_save, sender=Supplier)
+def touch_supplier_products(sender, instance, created, **kwargs):
+    if not created:
+        touch_products(Product.objects.filter(supplier_id=instance.pk))
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def touch_image_product(sender, instance, origin=None, **kwargs):
+    # Nothing to touch when the image goes with its product.
+    if isinstance(origin, Product) or getattr(origin, 'model', None) is Product:
+        return
+    touch_products(Product.objects.filter(pk=instance.product_id))
+
+@receiver(post_save, sender=StockMovement)
+def roll_up_sale(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_movements([instance])
+
+def invalidate_users(user_ids):
+    # After commit, so a request racing the write cannot re-cache the old row.
+    user_ids = list(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: user_cache.invalidate(*user_ids))
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    invalidate_users([instance.pk])
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_groups(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_users([instance.pk])
+    elif action == 'pre_clear':
+        invalidate_users(instance.user_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_users(pk_set)
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_members(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate_users(instance.user_set.values_list('pk', flat=True))
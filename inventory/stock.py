@@ -0,0 +1,136 @@
+# inventory/stock.py
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import serializers
+
+from .cache import product_cache
+from .changes import record_product_changes
+from .models import Product, StockMovement
+from .rollup import record_movements
+from .signals import broadcast_products_update
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+def adjust_stock(product_id, quantity_change, reason='', user=None):
+    """
+    Applies ``quantity_change`` with a single guarded statement,
+
+        UPDATE product SET quantity = quantity + :delta
+        WHERE id = :id AND quantity >= -:delta
+
+    and records the StockMovement in the same transaction. The check and the
+    write happen in one row update, so concurrent adjusters can neither lose
+    an update nor drive stock below zero, and no row lock is held across a
+    Python round trip. Returns the updated product, with its category,
+    supplier and images loaded; websocket clients hear of it on commit.
+    Raises ``Product.DoesNotExist`` or ``InsufficientStock``.
+    """
+    with transaction.atomic():
+        updated = Product.objects.filter(pk=product_id, quantity__gte=max(0, -quantity_change)).update(
+            quantity=F('quantity') + quantity_change,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            if not Product.objects.filter(pk=product_id).exists():
+                raise Product.DoesNotExist(f"Product {product_id} does not exist.")
+            raise InsufficientStock(f"Stock for product {product_id} cannot go below zero.")
+
+        StockMovement.objects.create(product_id=product_id, quantity_change=quantity_change, reason=reason, user=user)
+        record_product_changes([product_id])
+        broadcast_products_update([product_id])
+        product = Product.objects.select_related('category', 'supplier').prefetch_related('images').get(pk=product_id)
+    product_cache.invalidate(product_id)
+    return product
+
+
+MAX_BATCH_LINES = 1000
+
+
+class BatchAdjustmentLineSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(required=False)
+    sku = serializers.CharField(max_length=100, required=False)
+    quantity_change = serializers.IntegerField()
+    reason = serializers.CharField(max_length=255, required=False, allow_blank=True, default='Batch adjustment')
+
+    def validate(self, data):
+        if 'product_id' not in data and 'sku' not in data:
+            raise serializers.ValidationError('Either product_id or sku is required.')
+        return data
+
+
+def adjust_stock_batch(lines, user=None, atomic=True):
+    """
+    Applies many adjustments in one transaction. Rows are locked with
+    SELECT ... FOR UPDATE in primary-key order, so two batches touching the
+    same products always queue instead of deadlocking. Lines are applied in
+    request order, so several lines for one product see each other.
+
+    With ``atomic`` any failing line rolls back the whole batch; otherwise
+    failing lines are skipped and the rest are applied. Returns
+    ``(applied_product_ids, results)`` with one result per line; applied
+    products are broadcast on commit.
+    """
+    results = [None] * len(lines)
+    parsed = []
+    for index, line in enumerate(lines):
+        serializer = BatchAdjustmentLineSerializer(data=line)
+        if serializer.is_valid():
+            parsed.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+    skus = {data['sku'] for _, data in parsed if 'product_id' not in data}
+    sku_ids = dict(Product.objects.filter(sku__in=skus).values_list('sku', 'pk')) if skus else {}
+
+    with transaction.atomic():
+        product_ids = {data.get('product_id') or sku_ids.get(data.get('sku')) for _, data in parsed} - {None}
+        quantities = dict(
+            Product.objects.select_for_update().filter(pk__in=product_ids).order_by('pk').values_list('pk', 'quantity')
+        )
+
+        movements = []
+        now = timezone.now()
+        for index, data in parsed:
+            product_id = data.get('product_id') or sku_ids.get(data.get('sku'))
+            if product_id not in quantities:
+                results[index] = {'index': index, 'status': 'error', 'errors': {'product': ['Product not found.']}}
+                continue
+            new_quantity = quantities[product_id] + data['quantity_change']
+            if new_quantity < 0:
+                results[index] = {
+                    'index': index, 'product_id': product_id, 'status': 'error',
+                    'errors': {'quantity_change': ['Stock cannot go below zero.']},
+                }
+                continue
+            quantities[product_id] = new_quantity
+            movements.append(StockMovement(
+                product_id=product_id, quantity_change=data['quantity_change'],
+                reason=data['reason'], user=user, timestamp=now,
+            ))
+            results[index] = {'index': index, 'product_id': product_id, 'status': 'applied', 'quantity': new_quantity}
+
+        failed = any(result['status'] == 'error' for result in results)
+        if atomic and failed:
+            for result in results:
+                if result['status'] == 'applied':
+                    result.update(status='rolled_back')
+                    del result['quantity']
+            return [], results
+
+        applied_ids = sorted({movement.product_id for movement in movements})
+        Product.objects.bulk_update(
+            [Product(pk=pk, quantity=quantities[pk], updated_at=now) for pk in applied_ids],
+            ['quantity', 'updated_at'],
+        )
+        StockMovement.objects.bulk_create(movements)
+        record_movements(movements)
+        record_product_changes(applied_ids)
+        broadcast_products_update(applied_ids)
+
+    product_cache.invalidate(*applied_ids)
+    return applied_ids, results
@@ -0,0 +1,266 @@
+# inventory/synthetic.py
+
+import io
+import uuid
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .models import Category, Product, StockMovement, Supplier
+
+CHUNK = 50000
+
+
+def create_catalog(products, categories, rng):
+    """Creates a tagged supplier, categories and products; returns product ids."""
+    tag = uuid.uuid4().hex[:8]
+    supplier = Supplier.objects.create(name=f'Benchmark {tag}')
+    Category.objects.bulk_create(Category(name=f'Benchmark {tag} {i}') for i in range(categories))
+    category_list = list(Category.objects.filter(name__startswith=f'Benchmark {tag} '))
+    Product.objects.bulk_create(
+        Product(
+            name=f'Benchmark product {i}', sku=f'BENCH-{tag}-{i}', category=category_list[i % len(category_list)],
+            supplier=supplier, cost_price=1, sale_price=f'{rng.integers(100, 10000) / 100:.2f}',
+            quantity=int(rng.integers(0, 200)),
+        )
+        for i in range(products)
+    )
+    return np.array(Product.objects.filter(sku__startswith=f'BENCH-{tag}-').values_list('pk', flat=True))
+
+
+def create_movements(product_ids, count, days, rng, sale_ratio=0.9):
+    """
+    Bulk-inserts ``count`` movements spread over the last ``days`` days, a
+    ``sale_ratio`` share of them sales. Signals do not fire, so callers
+    rebuild the search index or sales rollup themselves if they need them.
+    """
+    now = timezone.now()
+    span = days * 86400
+    for offset in range(0, count, CHUNK):
+        size = min(CHUNK, count - offset)
+        products = rng.choice(product_ids, size)
+        changes = np.where(rng.random(size) < sale_ratio, -rng.integers(1, 10, size), rng.integers(10, 50, size))
+        seconds = rng.integers(0, span, size)
+        StockMovement.objects.bulk_create(
+            (
+                StockMovement(product_id=int(product), quantity_change=int(change), reason='Benchmark',
+                              timestamp=now - timedelta(seconds=int(second)))
+                for product, change, second in zip(products, changes, seconds)
+            ),
+            batch_size=5000,
+        )
+
+
+# Scalable, deterministic datasets (manage.py generate_data). Products are
+# generated in chunks, each from its own RNG derived from (seed, chunk), so
+# the data does not depend on how chunks are spread over processes.
+
+SKU_PREFIX = 'SYN'
+ROWS_PER_CHUNK = 200_000
+MAX_PRODUCTS_PER_CHUNK = 5000
+INSERT_BATCH = 10_000
+RESTOCK_RATIO = 0.05
+
+ADJECTIVES = [
+    'Compact', 'Wireless', 'Smart', 'Portable', 'Premium', 'Classic', 'Ultra', 'Eco', 'Pro', 'Mini',
+    'Heavy-duty', 'Ergonomic', 'Digital', 'Foldable', 'Rechargeable', 'Modular', 'Silent', 'Rugged',
+]
+NOUNS = [
+    'Speaker', 'Lamp', 'Backpack', 'Keyboard', 'Blender', 'Drill', 'Monitor', 'Router', 'Kettle', 'Camera',
+    'Headset', 'Chair', 'Charger', 'Tent', 'Watch', 'Mouse', 'Heater', 'Projector', 'Scale', 'Fan',
+]
+
+
+def generated_sku(seed, index):
+    # Zero-padded, so a chunk's products are one contiguous range of SKUs.
+    return f'{SKU_PREFIX}-{seed}-{index:09d}'
+
+
+def generated_products(seed):
+    return Product.objects.filter(sku__startswith=f'{SKU_PREFIX}-{seed}-')
+
+
+def plan_chunks(products, movements_per_product):
+    size = max(1, min(MAX_PRODUCTS_PER_CHUNK, ROWS_PER_CHUNK // (movements_per_product + 1)))
+    return [(chunk, first, min(size, products - first)) for chunk, first in enumerate(range(0, products, size))]
+
+
+def clear_generated(seed, batch_size=MAX_PRODUCTS_PER_CHUNK):
+    """Deletes the products generated with ``seed`` and everything hanging off them."""
+    products = generated_products(seed)
+    # One DELETE: movements have no delete signals or dependants.
+    StockMovement.objects.filter(product__in=products).delete()
+    deleted = 0
+    while True:
+        batch = list(products.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += Product.objects.filter(pk__in=batch).delete()[1].get(Product._meta.label, 0)
+
+
+def ensure_reference_data(categories, suppliers):
+    """The shared synthetic categories and suppliers, created when missing; returns their ids."""
+    Category.objects.bulk_create(
+        [Category(name=f'Synthetic category {i:03d}') for i in range(categories)], ignore_conflicts=True,
+    )
+    names = [f'Synthetic supplier {i:03d}' for i in range(suppliers)]
+    existing = set(Supplier.objects.filter(name__in=names).values_list('name', flat=True))
+    Supplier.objects.bulk_create(Supplier(name=name, contact_info='synthetic') for name in names if name not in existing)
+    category_ids = Category.objects.filter(name__in=[f'Synthetic category {i:03d}' for i in range(categories)])
+    return (
+        sorted(category_ids.values_list('pk', flat=True)),
+        sorted(Supplier.objects.filter(name__in=names).values_list('pk', flat=True)),
+    )
+
+
+def _timestamps(end, seconds_before):
+    # ISO strings in UTC, as Django stores them; PostgreSQL gets the offset spelled out.
+    from django.db import connection
+
+    stamps = np.datetime64(end.replace(tzinfo=None), 'us') - (seconds_before * 1e6).astype('timedelta64[us]')
+    text = np.char.replace(np.datetime_as_string(stamps, unit='us'), 'T', ' ')
+    return np.char.add(text, '+00:00') if connection.vendor == 'postgresql' else text
+
+
+def insert_columns(model, fields, columns):
+    """
+    Inserts rows given as equal-length columns straight into ``model``'s
+    table: COPY on PostgreSQL, batched executemany elsewhere. No model
+    instances, defaults or signals; at tens of millions of rows those
+    dominate the cost of bulk_create.
+    """
+    from django.db import connection
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = [model._meta.get_field(field).column for field in fields]
+    quoted = ', '.join(connection.ops.quote_name(name) for name in names)
+    columns = [column.tolist() if isinstance(column, np.ndarray) else list(column) for column in columns]
+    with connection.cursor() as cursor:
+        for start in range(0, len(columns[0]), INSERT_BATCH):
+            rows = list(zip(*(column[start:start + INSERT_BATCH] for column in columns)))
+            if connection.vendor == 'postgresql' and hasattr(cursor.cursor, 'copy_expert'):
+                buffer = io.StringIO()
+                for row in rows:
+                    buffer.write('\t'.join(r'\N' if value is None else str(value) for value in row) + '\n')
+                buffer.seek(0)
+                cursor.cursor.copy_expert(f'COPY {table} ({quoted}) FROM STDIN', buffer)
+            else:
+                placeholders = ', '.join(['%s'] * len(names))
+                cursor.executemany(f'INSERT INTO {table} ({quoted}) VALUES ({placeholders})', rows)
+
+
+def generate_chunk(chunk, first, count, spec):
+    """
+    Creates products ``first``..``first + count - 1`` of the dataset
+    described by ``spec`` (see generate_dataset) with their full movement
+    history, in one transaction. Each product opens with an initial stock
+    movement large enough that its stock never goes negative, then gets a
+    Poisson number of sales and restocks around ``movements_per_product``,
+    skewed so that some products sell far more than others. Returns the
+    number of movements written.
+    """
+    from django.db import transaction
+
+    rng = np.random.default_rng([spec['seed'], chunk])
+    index = np.arange(first, first + count)
+    span = spec['years'] * 365 * 86400
+
+    cost = rng.uniform(5, 500, count).round(2)
+    sale = (cost * rng.uniform(1.2, 2.0, count)).round(2)
+    reorder = rng.integers(10, 50, count)
+    category = rng.choice(spec['category_ids'], count)
+    supplier = rng.choice(spec['supplier_ids'], count)
+    names = [
+        f'{ADJECTIVES[a]} {NOUNS[n]} {i}'
+        for a, n, i in zip(rng.integers(0, len(ADJECTIVES), count), rng.integers(0, len(NOUNS), count), index)
+    ]
+
+    # Lognormal popularity with mean 1: a long tail of best sellers.
+    popularity = rng.lognormal(-0.5, 1.0, count)
+    per_product = rng.poisson(spec['movements_per_product'] * popularity)
+    owner = np.repeat(np.arange(count), per_product)
+    total = len(owner)
+    restock = rng.random(total) < RESTOCK_RATIO
+    change = np.where(restock, rng.integers(20, 200, total), -rng.integers(1, 10, total))
+    sold = np.bincount(owner, weights=np.where(restock, 0, -change), minlength=count).astype(np.int64)
+    restocked = np.bincount(owner, weights=np.where(restock, change, 0), minlength=count).astype(np.int64)
+    left = rng.integers(0, 3 * reorder)
+
+    # The opening stock lands in the first month; everything else after it.
+    opened = span - rng.uniform(0, 30 * 86400, count)
+    before = rng.random(total) * opened[owner]
+    users = spec['user_ids']
+
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            [
+                Product(
+                    name=name, sku=generated_sku(spec['seed'], i), category_id=int(category_id),
+                    supplier_id=int(supplier_id), cost_price=f'{c:.2f}', sale_price=f'{s:.2f}',
+                    reorder_point=int(r), quantity=int(q),
+                )
+                for name, i, category_id, supplier_id, c, s, r, q
+                in zip(names, index, category, supplier, cost, sale, reorder, left + restocked)
+            ],
+            batch_size=1000,
+        )
+        product_ids = np.array(
+            generated_products(spec['seed'])
+            .filter(sku__gte=generated_sku(spec['seed'], first), sku__lte=generated_sku(spec['seed'], first + count - 1))
+            .order_by('sku').values_list('pk', flat=True)
+        )
+
+        owners = np.concatenate([np.arange(count), owner])
+        seconds = np.concatenate([opened, before])
+        order = np.argsort(-seconds, kind='stable')
+        reasons = np.array(['Initial stock', 'Customer sale', 'Restock'], dtype=object)
+        kinds = np.concatenate([np.zeros(count, dtype=int), np.where(restock, 2, 1)])
+        insert_columns(StockMovement, ['product', 'quantity_change', 'reason', 'user', 'timestamp'], [
+            product_ids[owners[order]],
+            np.concatenate([sold + left, change])[order],
+            reasons[kinds[order]],
+            rng.choice(users, count + total)[order] if users else [None] * (count + total),
+            _timestamps(spec['end'], seconds[order]),
+        ])
+    return count + total
+
+
+def _generate_chunk(task):
+    chunk, first, count, spec = task
+    return count, generate_chunk(chunk, first, count, spec)
+
+
+def _run_chunks(tasks, processes):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    import django
+
+    if processes <= 1:
+        yield from map(_generate_chunk, tasks)
+        return
+    # spawn, so workers start clean: each sets Django up and opens its own connection.
+    with ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+    ) as pool:
+        for future in as_completed([pool.submit(_generate_chunk, task) for task in tasks]):
+            yield future.result()
+
+
+def generate_dataset(spec, processes=1, progress=None):
+    """
+    Generates ``spec['products']`` products and their movements, chunk by
+    chunk, on up to ``processes`` worker processes. ``spec`` also holds
+    ``seed``, ``movements_per_product``, ``years``, ``end`` (the aware
+    datetime history runs up to) and the ``category_ids``, ``supplier_ids``
+    and ``user_ids`` to draw from. ``progress(products, movements)`` is
+    called as chunks finish. Returns the number of movements written.
+    """
+    tasks = [(*chunk, spec) for chunk in plan_chunks(spec['products'], spec['movements_per_product'])]
+    written = 0
+    for products, movements in _run_chunks(tasks, min(processes, len(tasks))):
+        written += movements
+        if progress:
+            progress(products, movements)
+    return written
@@ -1,48 +1,33 @@
 # inventory/tasks.py
 
-import pandas as pd
-import numpy as np
+import logging
+
+from django.conf import settings
 from .models import StockMovement
-from statsmodels.tsa.arima.model import ARIMA 
-import warnings
 
-warnings.filterwarnings("ignore", category=UserWarning)
+logger = logging.getLogger(__name__)
 
 def get_sales_forecast(product_id):
+    # pandas and the models load on the first forecast, not at worker boot.
+    import pandas as pd
+    from .forecasting import MIN_SALES, fit_forecast, monthly_sales
+
     movements = StockMovement.objects.filter(
-        product_id=product_id, 
+        product_id=product_id,
         quantity_change__lt=0
     ).order_by('timestamp')
 
-    if len(movements) < 3:
+    if len(movements) < MIN_SALES:
         return None
 
     df = pd.DataFrame(list(movements.values('timestamp', 'quantity_change')))
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['quantity_sold'] = df['quantity_change'].abs()
-    
-    sales_by_month = df.set_index('timestamp').resample('M').sum()['quantity_sold']
-    
-    if len(sales_by_month) < 3:
-        return None
-        
+    sales_by_month = monthly_sales(df)
+
     try:
-        model = ARIMA(sales_by_month, order=(1, 1, 1))
-        model_fit = model.fit()
-        
-        predictions = model_fit.forecast(steps=4)
-        
-        forecast = [int(max(0, p)) for p in predictions]
-
-        historical_data = {
-            "labels": sales_by_month.index.strftime('%Y-%m').tolist(),
-            "data": sales_by_month.values.tolist()
-        }
-        
-        return {
-            "historical": historical_data,
-            "forecast": forecast
-        }
+        return fit_forecast(sales_by_month, forecast_model())
     except Exception as e:
-        print(f"ARIMA model failed for product {product_id}: {e}")
+        logger.warning("Forecast failed for product %s: %s", product_id, e)
         return None
+
+def forecast_model():
+    return getattr(settings, 'FORECAST_MODEL', 'auto')
@@ -1 +1,867 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import export, labels
+from .analytics import ProductColumns, dashboard_data, orm_dashboard_data
+from .authentication import load_user
+from .broadcast import product_broadcaster, send_products
+from .cache import product_cache, user_cache
+from .models import Category, Product, ProductChange, ProductForecast, ProductImage, StockMovement, Supplier
+from .forecasting import FORECAST_STEPS, backtest, predict, rank_models
+from .forecasts import forecast_worker, stale_forecasts
+from .importer import import_products
+from .management.commands.bench_analytics import comparable
+from .querybudget import QueryBudgetExceeded
+from .queryplans import analyze, full_scans, hot_queries
+from .rollup import SalesWindow
+from .search import get_capabilities
+from .stock import adjust_stock, adjust_stock_batch
+from .synthetic import (
+    clear_generated, create_catalog, create_movements, ensure_reference_data, generate_dataset, generated_products,
+)
+from .topics import ALL_PRODUCTS_GROUP, LOW_STOCK_GROUP, category_group, product_group
+
+
+def make_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+class InventoryAPITestCase(APITestCase):
+    """Authenticates with a real access token, so requests pay for auth like in production."""
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        self.user = User.objects.create_user('tester', password='tester-password')
+        self.auth_header = f'Bearer {AccessToken.for_user(self.user)}'
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth_header)
+
+    def create_products(self, count, category=None, supplier=None, prefix='P'):
+        supplier = supplier or Supplier.objects.create(name=f'{prefix} supplier')
+        category = category or Category.objects.create(name=f'{prefix} category')
+        return [
+            Product.objects.create(
+                name=f'{prefix} product {i}', sku=f'{prefix}-{i}', category=category, supplier=supplier,
+                cost_price='1.00', sale_price='2.00', quantity=100,
+            )
+            for i in range(count)
+        ]
+
+
+class ChangeFeedTests(InventoryAPITestCase):
+    def test_product_moved_out_of_category_is_reported_as_left(self):
+        moved, stays = self.create_products(2, prefix='C')
+        other = Category.objects.create(name='Other category')
+        cursor = ProductChange.objects.latest('seq').seq
+        moved.category = other
+        moved.save()
+        stays.quantity = 5
+        stays.save()
+
+        response = self.client.get('/api/products/changes/', {'cursor': cursor, 'category': stays.category_id})
+        self.assertEqual([product['id'] for product in response.data['products']], [stays.pk])
+        self.assertEqual(response.data['left'], [moved.pk])
+        self.assertEqual(response.data['deleted'], [])
+
+        response = self.client.get('/api/products/changes/', {'cursor': cursor, 'category': other.pk})
+        self.assertEqual([product['id'] for product in response.data['products']], [moved.pk])
+        self.assertEqual(response.data['left'], [stays.pk])
+
+
+class KeysetPaginationTests(InventoryAPITestCase):
+    def test_pages_follow_next_links(self):
+        products = self.create_products(5)
+        response = self.client.get('/api/products/', {'cursor': '', 'page_size': 2})
+        seen = [row['id'] for row in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [row['id'] for row in response.data['results']]
+        self.assertEqual(seen, [product.pk for product in products])
+
+    def test_forged_cursor_values_are_not_found(self):
+        self.create_products(2)
+        for payload in (
+            {'o': 'updated_at', 'v': ['not-a-date', 1], 'r': 0},
+            {'o': 'updated_at', 'v': [None, 1], 'r': 0},
+            {'o': 'id', 'v': ['x'], 'r': 0},
+            {'o': 'id', 'v': 'x', 'r': 0},
+            {'o': 'id', 'v': [[1]], 'r': 0},
+        ):
+            with self.subTest(payload=payload):
+                response = self.client.get('/api/products/', {'cursor': make_cursor(payload)})
+                self.assertEqual(response.status_code, 404)
+
+
+
+class ProductSearchTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        # Probed once per process; keep that query out of the budgeted requests.
+        get_capabilities()
+        self.lamp, self.chair = self.create_products(2, prefix='S')
+        self.lamp.name, self.lamp.sku = 'Blue ox desk lamp', 'LMP-100'
+        self.lamp.save()
+        self.chair.name, self.chair.sku = 'Oak chair', 'CHR-200'
+        self.chair.save()
+
+    def search(self, term):
+        return [row['id'] for row in self.client.get('/api/products/', {'search': term}).data['results']]
+
+    def test_word_prefixes(self):
+        self.assertEqual(self.search('lam blu'), [self.lamp.pk])
+
+    def test_sku_prefix(self):
+        self.assertEqual(self.search('chr-2'), [self.chair.pk])
+
+    def test_short_words(self):
+        # Shorter than MySQL's FULLTEXT minimum token size.
+        self.assertEqual(self.search('ox'), [self.lamp.pk])
+        self.assertEqual(self.search('ox lamp'), [self.lamp.pk])
+
+
+class ProductCacheTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        [self.product] = self.create_products(1, prefix='K')
+        self.url = f'/api/products/{self.product.pk}/'
+
+    def test_repeat_reads_are_cache_hits(self):
+        product_cache.reset_stats()
+        first = self.client.get('/api/products/').data
+        second = self.client.get('/api/products/').data
+        self.assertEqual(first, second)
+        self.assertEqual((product_cache.hits, product_cache.misses), (1, 1))
+
+    def test_related_changes_reach_the_cached_product(self):
+        self.client.get(self.url)
+        self.product.category.name = 'Renamed category'
+        self.product.category.save()
+        self.assertEqual(self.client.get(self.url).data['category']['name'], 'Renamed category')
+
+        self.product.supplier.name = 'Renamed supplier'
+        self.product.supplier.save()
+        self.assertEqual(self.client.get(self.url).data['supplier']['name'], 'Renamed supplier')
+
+        image = ProductImage.objects.create(product=self.product, image='https://example.com/k.jpg')
+        self.assertEqual(len(self.client.get(self.url).data['images']), 1)
+        image.delete()
+        self.assertEqual(self.client.get(self.url).data['images'], [])
+
+        self.product.name = 'Renamed product'
+        self.product.save()
+        self.assertEqual(self.client.get('/api/products/').data['results'][0]['name'], 'Renamed product')
+
+    def test_lost_invalidation_is_caught_by_the_version(self):
+        self.client.get(self.url)
+        with mock.patch.object(product_cache, 'invalidate'):
+            self.product.category.name = 'Renamed category'
+            self.product.category.save()
+        self.assertEqual(self.client.get(self.url).data['category']['name'], 'Renamed category')
+
+
+@override_settings(ANALYTICS_CACHE_BACKGROUND=False)
+class ConditionalGetTests(InventoryAPITestCase):
+    """A matching If-None-Match is a 304, and writes change the ETag."""
+
+    def setUp(self):
+        super().setUp()
+        self.products = self.create_products(3, prefix='E')
+        self.product = self.products[0]
+
+    def assertRevalidates(self, url, change):
+        etag = self.client.get(url)['ETag']
+        self.assertTrue(etag)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def rename(self):
+        self.product.name = 'Renamed'
+        self.product.save()
+
+    def sell(self):
+        response = self.client.post(
+            f'/api/products/{self.product.pk}/adjust_stock/', {'quantity_change': -1, 'reason': 'Sale'}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_product_list(self):
+        self.assertRevalidates('/api/products/', self.rename)
+        self.assertRevalidates('/api/products/', self.sell)
+
+    def test_product_detail(self):
+        url = f'/api/products/{self.product.pk}/'
+        self.assertRevalidates(url, self.rename)
+        self.assertRevalidates(url, self.sell)
+
+    def test_dashboard_analytics(self):
+        self.assertRevalidates('/api/analytics/', self.rename)
+        self.assertRevalidates('/api/analytics/', self.sell)
+
+
+class ExportTests(InventoryAPITestCase):
+    def test_csv(self):
+        products = self.create_products(3)
+        response = self.client.get('/api/products/export/')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'name', 'sku'])
+        self.assertEqual([int(line.split(',')[0]) for line in lines[1:]], [product.pk for product in products])
+
+    async def test_asgi_response_is_read_as_it_is_sent(self):
+        await sync_to_async(self.create_products)(6)
+        pulled = []
+        iter_rows = export.iter_rows
+
+        def counting_rows(*args, **kwargs):
+            for row in iter_rows(*args, **kwargs):
+                pulled.append(row)
+                yield row
+
+        with mock.patch.object(export, 'iter_rows', counting_rows), mock.patch.object(export, 'CHUNK_SIZE', 2):
+            response = await self.async_client.get(
+                '/api/products/export/', {'output': 'ndjson'}, headers={'Authorization': self.auth_header},
+            )
+            self.assertTrue(response.is_async)
+            parts = aiter(response.streaming_content)
+            first = await anext(parts)
+            self.assertEqual(len(pulled), 2)
+            self.assertEqual(first.count(b'\n'), 2)
+            rest = [part async for part in parts]
+        self.assertEqual(len(rest), 2)
+        self.assertEqual(len(pulled), 6)
+
+
+class LabelTests(InventoryAPITestCase):
+    def test_closing_early_cancels_pages_not_started(self):
+        done, waiting, queued = Future(), Future(), Future()
+        done.set_result('page 1')
+        pool = mock.Mock()
+        pool.submit.side_effect = [done, waiting, queued]
+        with mock.patch.object(labels, 'label_pool', return_value=pool):
+            pages = labels.render_label_pages([('Name', 'SKU', 'data')] * labels.LABELS_PER_PAGE * 5, processes=2)
+            self.assertEqual(next(pages), 'page 1')
+        self.assertEqual(pool.submit.call_count, 3)
+        pages.close()
+        self.assertTrue(waiting.cancelled())
+        self.assertTrue(queued.cancelled())
+
+    def test_broken_pool_is_replaced_on_submit(self):
+        done = Future()
+        done.set_result('page')
+        broken, fresh = mock.Mock(), mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool
+        fresh.submit.return_value = done
+        self.enterContext(mock.patch.object(labels, '_pool', None))
+        self.enterContext(mock.patch.object(labels, 'ProcessPoolExecutor', side_effect=[broken, fresh]))
+        pages = list(labels.render_label_pages([('Name', 'SKU', 'data')] * labels.LABELS_PER_PAGE * 2, processes=2))
+        self.assertEqual(pages, ['page', 'page'])
+        broken.shutdown.assert_called_once()
+        self.assertEqual(fresh.submit.call_count, 2)
+        self.assertIs(labels.label_pool(2, broken=broken), fresh)
+
+    @override_settings(LABEL_MAX_PROCESSES=2)
+    async def test_asgi_sheet_is_streamed_from_the_shared_pool(self):
+        products = await sync_to_async(self.create_products)(labels.LABELS_PER_PAGE + 1)
+        response = await self.async_client.get(
+            '/api/products/labels/', {'category': products[0].category_id},
+            headers={'Authorization': self.auth_header},
+        )
+        self.assertTrue(response.is_async)
+        parts = [part async for part in response.streaming_content]
+        self.assertTrue(parts[0].startswith(b'%PDF-'))
+        self.assertIn(b'/Count 2', b''.join(parts))
+        self.assertIs(labels.label_pool(2), labels.label_pool(2))
+
+
+class ImportTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.category = Category.objects.create(name='Import category')
+        self.supplier = Supplier.objects.create(name='Import supplier')
+
+    def row(self, sku, **fields):
+        return {
+            'sku': sku, 'name': f'Imported {sku}', 'category_id': self.category.pk,
+            'supplier_id': self.supplier.pk, 'cost_price': '1.00', 'sale_price': '2.00', **fields,
+        }
+
+    def test_upserts_and_reports_bad_rows(self):
+        response = self.client.post('/api/products/import/', [
+            self.row('I-1', quantity=5), self.row('I-2', category_id=0), {'name': 'no sku'},
+        ], format='json')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3])
+        response = self.client.post('/api/products/import/', [self.row('I-1', quantity=3)], format='json')
+        self.assertEqual((response.data['created'], response.data['updated']), (0, 1))
+        self.assertEqual(Product.objects.get(sku='I-1').quantity, 3)
+
+    def test_integrity_error_fails_only_its_batch(self):
+        bulk_create = Product.objects.bulk_create
+
+        def racing_bulk_create(products, *args, **kwargs):
+            # Another writer takes I-3 between the batch's lookup and its insert.
+            if any(product.sku == 'I-3' for product in products):
+                bulk_create([Product(**{**self.row('I-3'), 'name': 'Concurrent'})])
+            return bulk_create(products, *args, **kwargs)
+
+        rows = [self.row('I-1'), self.row('I-2'), self.row('I-3'), {'sku': 'I-4'}, self.row('I-5')]
+        with mock.patch.object(Product.objects, 'bulk_create', racing_bulk_create):
+            report = import_products(rows, batch_size=2).as_dict()
+
+        self.assertEqual((report['created'], report['updated']), (3, 0))
+        self.assertEqual([error['row'] for error in report['errors']], [3, 4])
+        self.assertIn('rolled back', report['errors'][0]['errors']['non_field_errors'][0])
+        self.assertIn('sale_price', report['errors'][1]['errors'])
+        self.assertEqual(set(Product.objects.values_list('sku', flat=True)), {'I-1', 'I-2', 'I-5'})
+
+
+class StockAdjustmentTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = self.create_products(2, prefix='S')
+        self.product = self.products[0]
+        self.url = f'/api/products/{self.product.pk}/adjust_stock/'
+
+    def test_adjustment_returns_and_broadcasts_the_product(self):
+        with mock.patch.object(product_broadcaster, 'queue') as queue:
+            with self.captureOnCommitCallbacks(execute=True):
+                product = adjust_stock(self.product.pk, -5, reason='Sale')
+        self.assertEqual(product.quantity, 95)
+        queue.assert_called_once_with([self.product.pk])
+
+        response = self.client.post(self.url, {'quantity_change': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['quantity'], 98)
+
+    def test_below_zero_is_refused_without_a_movement(self):
+        response = self.client.post(self.url, {'quantity_change': -101}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StockMovement.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 100)
+
+    def test_unknown_product_is_not_found(self):
+        response = self.client.post('/api/products/0/adjust_stock/', {'quantity_change': 1}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(StockMovement.objects.exists())
+
+
+class StockBatchTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.first, self.second = self.create_products(2, prefix='BT')
+        self.lines = [
+            {'product_id': self.first.pk, 'quantity_change': -10},
+            {'sku': self.second.sku, 'quantity_change': 5},
+            {'product_id': self.second.pk, 'quantity_change': -200},
+        ]
+
+    def quantities(self):
+        return list(Product.objects.order_by('pk').values_list('quantity', flat=True))
+
+    def test_atomic_batch_rolls_back_every_line(self):
+        applied_ids, results = adjust_stock_batch(self.lines)
+        self.assertEqual(applied_ids, [])
+        self.assertEqual([result['status'] for result in results], ['rolled_back', 'rolled_back', 'error'])
+        self.assertEqual(self.quantities(), [100, 100])
+        self.assertFalse(StockMovement.objects.exists())
+
+    def test_partial_batch_applies_valid_lines(self):
+        with mock.patch.object(product_broadcaster, 'queue') as queue:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    '/api/products/adjust_stock/', {'adjustments': self.lines, 'mode': 'partial'}, format='json',
+                )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['applied'], response.data['failed']), (2, 1))
+        self.assertEqual(response.data['results'][2]['errors'], {'quantity_change': ['Stock cannot go below zero.']})
+        self.assertEqual(self.quantities(), [90, 105])
+        self.assertEqual(StockMovement.objects.count(), 2)
+        queue.assert_called_once_with([self.first.pk, self.second.pk])
+
+
+IN_MEMORY_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class ProductBroadcastTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = self.create_products(5, prefix='W')
+        self.sends = []
+        layer = get_channel_layer()
+        group_send = layer.group_send
+
+        async def capture(group, message):
+            self.sends.append((group, [product['id'] for product in message['products']]))
+            await group_send(group, message)
+
+        self.enterContext(mock.patch.object(layer, 'group_send', capture))
+
+    def frames(self, group):
+        return [ids for sent_to, ids in self.sends if sent_to == group]
+
+    def test_saves_in_one_transaction_make_one_frame(self):
+        with mock.patch.object(product_broadcaster._worker, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    for product in self.products[:3]:
+                        product.quantity = 50
+                        product.save()
+                self.assertEqual(submit.call_count, 0)
+            self.assertEqual(submit.call_count, 1)
+            product_broadcaster.flush()
+        ids = [product.pk for product in self.products[:3]]
+        self.assertEqual(self.frames(ALL_PRODUCTS_GROUP), [ids])
+        self.assertEqual(self.frames(category_group(self.products[0].category_id)), [ids])
+        self.assertEqual(self.frames(product_group(ids[0])), [ids[:1]])
+
+    def test_rolled_back_saves_are_not_sent(self):
+        with mock.patch.object(product_broadcaster._worker, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                self.products[0].save()
+            self.assertEqual(len(callbacks), 1)
+            submit.assert_not_called()
+
+    @override_settings(PRODUCT_BROADCAST_BATCH_SIZE=2)
+    def test_frames_split_at_the_batch_size(self):
+        ids = [product.pk for product in self.products]
+        send_products(ids)
+        self.assertEqual(self.frames(ALL_PRODUCTS_GROUP), [ids[0:2], ids[2:4], ids[4:]])
+        self.assertEqual(self.frames(category_group(self.products[0].category_id)), [ids[0:2], ids[2:4], ids[4:]])
+        self.assertEqual(self.frames(LOW_STOCK_GROUP), [])
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class ProductConsumerTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.token = AccessToken.for_user(self.user)
+        self.first, self.second = self.create_products(2, prefix='WA')
+        [self.other] = self.create_products(1, prefix='WB')
+
+    async def connect(self, query=''):
+        from backend.asgi import application
+
+        client = WebsocketCommunicator(application, f'/ws/products/?token={self.token}{query}')
+        connected, _ = await client.connect()
+        self.assertTrue(connected)
+        return client
+
+    async def request(self, client, message):
+        await client.send_json_to(message)
+        return await client.receive_json_from()
+
+    async def received_ids(self, client, product_ids):
+        await database_sync_to_async(send_products)(product_ids)
+        frames = []
+        while not await client.receive_nothing():
+            frames.append(await client.receive_json_from())
+        return sorted(product['id'] for frame in frames for product in frame['products'])
+
+    async def test_updates_follow_subscriptions(self):
+        client = await self.connect()
+        everything = [self.first.pk, self.second.pk, self.other.pk]
+        self.assertEqual(await self.received_ids(client, everything), everything)
+
+        reply = await self.request(client, {'action': 'subscribe', 'categories': [self.first.category_id]})
+        self.assertEqual(reply, {
+            'type': 'subscriptions', 'categories': [self.first.category_id], 'products': [],
+            'low_stock': False, 'all': False,
+        })
+        self.assertEqual(await self.received_ids(client, everything), [self.first.pk, self.second.pk])
+
+        reply = await self.request(client, {'action': 'set', 'products': [self.other.pk]})
+        self.assertEqual((reply['categories'], reply['products']), ([], [self.other.pk]))
+        self.assertEqual(await self.received_ids(client, everything), [self.other.pk])
+
+        reply = await self.request(client, {'action': 'unsubscribe', 'products': [self.other.pk]})
+        self.assertEqual((reply['categories'], reply['products'], reply['all']), ([], [], False))
+        self.assertEqual(await self.received_ids(client, everything), [])
+
+        reply = await self.request(client, {'action': 'subscribe', 'products': 'all'})
+        self.assertEqual(reply['type'], 'error')
+        await client.disconnect()
+
+    def move_and_restock(self):
+        cursor = ProductChange.objects.latest('seq').seq
+        self.second.category = self.other.category
+        self.second.save()
+        self.first.quantity = 150
+        self.first.save()
+        return cursor
+
+    async def test_sync_catches_up_from_a_cursor(self):
+        cursor = await sync_to_async(self.move_and_restock)()
+        client = await self.connect()
+        await self.request(client, {'action': 'set', 'categories': [self.first.category_id]})
+        changes = await self.request(client, {'action': 'sync', 'cursor': cursor})
+        self.assertEqual(changes['type'], 'changes')
+        self.assertEqual([product['id'] for product in changes['products']], [self.first.pk])
+        self.assertEqual(changes['left'], [self.second.pk])
+        self.assertEqual(changes['deleted'], [])
+
+        reply = await self.request(client, {'action': 'sync', 'cursor': 10 ** 9})
+        self.assertEqual(reply['type'], 'resync_required')
+        await client.disconnect()
+
+    async def test_connect_with_a_cursor_syncs_everything(self):
+        cursor = await sync_to_async(self.move_and_restock)()
+        client = await self.connect(f'&cursor={cursor}')
+        changes = await client.receive_json_from()
+        self.assertEqual([product['id'] for product in changes['products']], [self.first.pk, self.second.pk])
+        self.assertEqual(changes['left'], [])
+        await client.disconnect()
+
+
+class DashboardAnalyticsTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.sold = self.create_products(4, prefix='Sold')
+        # Products that never sell still count towards the catalog totals.
+        self.unsold = self.create_products(3, prefix='Unsold')
+        self.unsold[0].quantity = 1
+        self.unsold[0].save()
+        for i, product in enumerate(self.sold):
+            for days in range(i + 1):
+                StockMovement.objects.create(
+                    product=product, quantity_change=-(i + 1), reason='Sale',
+                    timestamp=timezone.now() - timedelta(days=days * 20, hours=1),
+                )
+
+    def test_numpy_engine_matches_orm(self):
+        for start in (None, timezone.now() - timedelta(days=30, minutes=7)):
+            with self.subTest(start=start):
+                data = dashboard_data(SalesWindow(start))
+                self.assertEqual(comparable(data), comparable(orm_dashboard_data(SalesWindow(start))))
+                self.assertEqual(data['total_products'], 7)
+                self.assertEqual(data['low_stock_items'], 1)
+
+    def test_loads_only_products_sold_in_the_window(self):
+        with mock.patch('inventory.analytics.ProductColumns', wraps=ProductColumns) as columns:
+            dashboard_data(SalesWindow(timezone.now() - timedelta(days=30)))
+        loaded = set(columns.call_args.args[0].values_list('pk', flat=True))
+        self.assertEqual(loaded, {product.pk for product in self.sold})
+
+
+class QueryPlanTests(TestCase):
+    """
+    The hot StockMovement queries must not scan the whole table. Planners
+    only pick indexes over scans once the table is large enough, hence the
+    bulk data; ``manage.py check_query_plans`` runs the same checks bigger.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = np.random.default_rng(0)
+        product_ids = create_catalog(300, 10, rng)
+        create_movements(product_ids, 30000, 365, rng)
+        analyze()
+        cls.product = Product.objects.filter(movements__isnull=False).order_by('-pk').first()
+
+    def test_hot_queries_use_indexes(self):
+        for name, run in hot_queries(self.product).items():
+            with self.subTest(query=name):
+                scanned, plans = full_scans(name, run)
+                self.assertFalse(scanned, '\n\n'.join(f'{sql}\n{plan}' for sql, plan in plans))
+
+
+class ForecastTests(InventoryAPITestCase):
+    def setUp(self):
+        super().setUp()
+        [self.product] = self.create_products(1, prefix='F')
+        for days in range(60, 0, -3):
+            StockMovement.objects.create(
+                product=self.product, quantity_change=-2, reason='Sale',
+                timestamp=timezone.now() - timedelta(days=days),
+            )
+
+    def test_detail_serves_pending_without_fitting_in_process(self):
+        with mock.patch.object(forecast_worker, 'submit') as submit:
+            response = self.client.get(f'/api/products/{self.product.pk}/')
+        self.assertEqual(response.data['forecast'], {'status': 'pending'})
+        submit.assert_not_called()
+
+    def test_worker_refreshes_stale_forecasts(self):
+        self.assertEqual(list(stale_forecasts().values_list('pk', flat=True)), [self.product.pk])
+        call_command('forecast_worker', '--once', stdout=io.StringIO())
+        self.assertFalse(stale_forecasts().exists())
+        latest = StockMovement.objects.filter(product=self.product).latest('id')
+        self.assertEqual(ProductForecast.objects.get(product=self.product).last_sale_id, latest.pk)
+
+    def test_batch_all_is_queued_for_the_worker(self):
+        self.user.is_staff = True
+        self.user.save()
+        call_command('forecast_worker', '--once', stdout=io.StringIO())
+        with mock.patch('inventory.forecasts.get_sales_forecast') as fit:
+            response = self.client.post('/api/products/forecast/', {'all': True}, format='json')
+        fit.assert_not_called()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['queued'], 1)
+        self.assertEqual(self.client.get('/api/products/forecast/').data, {'queued': 1})
+
+        call_command('forecast_worker', '--once', stdout=io.StringIO())
+        self.assertEqual(self.client.get('/api/products/forecast/').data, {'queued': 0})
+
+    def test_batch_products_are_queued_for_the_worker(self):
+        self.user.is_staff = True
+        self.user.save()
+        call_command('forecast_worker', '--once', stdout=io.StringIO())
+        with mock.patch('inventory.forecasts.get_sales_forecast') as fit:
+            response = self.client.post('/api/products/forecast/', {'products': [self.product.pk]}, format='json')
+        fit.assert_not_called()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['queued'], 1)
+        self.assertEqual(list(stale_forecasts().values_list('pk', flat=True)), [self.product.pk])
+
+
+class UserCacheTests(InventoryAPITestCase):
+    """Every change to a user's groups must drop their cached entry."""
+
+    def setUp(self):
+        super().setUp()
+        self.group = Group.objects.create(name='Clerks')
+
+    def assertInvalidated(self, change, user=None):
+        user = user or self.user
+        user_cache.get(user.pk, 'token', load_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        load = mock.Mock(side_effect=load_user)
+        user_cache.get(user.pk, 'token', load)
+        load.assert_called_once()
+
+    def test_repeat_tokens_are_served_from_the_cache(self):
+        self.assertTrue(user_cache.enabled)
+        user_cache.reset_stats()
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/products/').status_code, 200)
+        self.assertEqual((user_cache.hits, user_cache.misses), (1, 1))
+
+    def test_dummy_cache_is_not_used(self):
+        with override_settings(CACHES=settings.CACHES | {'users': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }}):
+            self.assertFalse(user_cache.enabled)
+            with mock.patch.object(user_cache, 'get') as get:
+                self.assertEqual(self.client.get('/api/products/').status_code, 200)
+            get.assert_not_called()
+
+    def test_groups_changed_from_the_user(self):
+        self.assertInvalidated(lambda: self.user.groups.add(self.group))
+        self.assertInvalidated(lambda: self.user.groups.remove(self.group))
+        self.user.groups.add(self.group)
+        self.assertInvalidated(lambda: self.user.groups.clear())
+
+    def test_members_changed_from_the_group(self):
+        self.assertInvalidated(lambda: self.group.user_set.add(self.user))
+        self.assertInvalidated(lambda: self.group.user_set.remove(self.user))
+        self.group.user_set.add(self.user)
+        self.assertInvalidated(lambda: self.group.user_set.clear())
+
+    def test_group_saved_or_deleted(self):
+        self.user.groups.add(self.group)
+        self.group.name = 'Senior clerks'
+        self.assertInvalidated(self.group.save)
+        self.assertInvalidated(self.group.delete)
+
+
+class ForecastModelSelectionTests(TestCase):
+    def test_auto_picks_the_lowest_holdout_error(self):
+        trend = 10 + 5 * np.arange(11.0)
+        errors = {name: backtest(trend, name, FORECAST_STEPS)[0] for name in ('ses', 'croston', 'holt')}
+        self.assertEqual(min(errors, key=errors.get), 'holt')
+        self.assertEqual(rank_models(trend), ['holt', 'ses', 'croston'])
+        np.testing.assert_allclose(predict('auto', trend, 2), [65, 70])
+
+    def test_cheapest_model_wins_within_the_margin(self):
+        level = np.array([20.0, 21, 19, 20, 22, 18, 20, 21, 19, 20])
+        self.assertEqual(rank_models(level)[0], 'ses')
+
+
+# Imports the WSGI app and its URLconf in a fresh interpreter, as a worker
+# does before its first request, and reports which heavy libraries are
+# loaded and which of our modules hold a name from one of them.
+STARTUP_PROBE = '''
+import json, sys, types
+import backend.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+HEAVY = {'numpy', 'pandas', 'scipy', 'statsmodels'}
+
+def library(value):
+    name = value.__name__ if isinstance(value, types.ModuleType) else getattr(value, '__module__', None)
+    return name.split('.')[0] if isinstance(name, str) else None
+
+print(json.dumps({
+    'loaded': sorted(name for name in HEAVY if name in sys.modules),
+    'users': sorted(
+        f'{module_name}.{attr}' for module_name, module in list(sys.modules.items())
+        if module_name.split('.')[0] in ('backend', 'inventory')
+        for attr, value in vars(module).items() if library(value) in HEAVY
+    ),
+}))
+'''
+
+
+class StartupImportTests(TestCase):
+    def test_web_app_starts_without_the_data_libraries(self):
+        probe = subprocess.run(
+            [sys.executable, '-c', STARTUP_PROBE], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE),
+        )
+        self.assertEqual(probe.returncode, 0, probe.stderr)
+        result = json.loads(probe.stdout.strip().splitlines()[-1])
+        # Daphne, installed for runserver, loads NumPy through autobahn; our
+        # own modules must not import any of these at startup.
+        self.assertEqual(set(result['loaded']) - {'numpy'}, set())
+        self.assertEqual(result['users'], [])
+
+
+class SyntheticDataTests(TestCase):
+    def generate(self, seed, end):
+        category_ids, supplier_ids = ensure_reference_data(3, 2)
+        spec = {
+            'seed': seed, 'products': 40, 'movements_per_product': 6, 'years': 1, 'end': end,
+            'category_ids': category_ids,
+            'supplier_ids': supplier_ids, 'user_ids': [],
+        }
+        # Small chunks, so the dataset spans several RNG streams.
+        with mock.patch('inventory.synthetic.ROWS_PER_CHUNK', 70):
+            generate_dataset(spec)
+        products = list(generated_products(seed).order_by('sku').values_list(
+            'sku', 'name', 'category__name', 'supplier__name', 'cost_price', 'sale_price', 'reorder_point', 'quantity',
+        ))
+        movements = list(StockMovement.objects.filter(product__sku__startswith=f'SYN-{seed}-').order_by(
+            'product__sku', 'timestamp', 'quantity_change',
+        ).values_list('product__sku', 'quantity_change', 'reason', 'timestamp'))
+        return products, movements
+
+    def test_same_seed_gives_the_same_data(self):
+        end = timezone.now()
+        products, movements = self.generate(7, end)
+        clear_generated(7)
+        self.assertEqual(self.generate(7, end), (products, movements))
+        self.assertEqual(len(products), 40)
+        self.assertGreater(len(movements), 40)
+
+        other, _ = self.generate(8, end)
+        self.assertNotEqual([row[1:] for row in other], [row[1:] for row in products])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(InventoryAPITestCase):
+    """
+    Each budgeted endpoint on data with several related rows per object, so
+    a query per row (an N+1) overruns the budget and the middleware fails
+    the request.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.save()
+        supplier = Supplier.objects.create(name='Budget supplier')
+        self.products = []
+        for c in range(3):
+            category = Category.objects.create(name=f'Budget category {c}')
+            self.products += self.create_products(4, category=category, supplier=supplier, prefix=f'B{c}')
+        for product in self.products:
+            for i in range(2):
+                ProductImage.objects.create(product=product, image=f'https://example.com/{product.pk}/{i}.jpg')
+            for days in (1, 3, 40):
+                StockMovement.objects.create(
+                    product=product, quantity_change=-2, reason='Sale', user=self.user,
+                    timestamp=timezone.now() - timedelta(days=days),
+                )
+        self.product = self.products[0]
+
+    def test_over_budget_fails(self):
+        with override_settings(QUERY_BUDGETS={'product-list': 1}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/products/')
+
+    def test_product_list(self):
+        for params in ({}, {'view': 'compact'}, {'fields': 'id,name,image'}, {'cursor': ''}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/products/', params).status_code, 200)
+
+    def test_product_detail(self):
+        self.assertEqual(self.client.get(f'/api/products/{self.product.pk}/').status_code, 200)
+
+    def test_product_patch(self):
+        url = f'/api/products/{self.product.pk}/'
+        self.assertEqual(self.client.patch(url, {'name': 'Renamed'}, format='json').status_code, 200)
+
+    def test_product_put(self):
+        url = f'/api/products/{self.product.pk}/'
+        data = {
+            'name': 'Replaced', 'sku': self.product.sku, 'category_id': self.product.category_id,
+            'supplier_id': self.product.supplier_id, 'cost_price': '1.00', 'sale_price': '3.00',
+            'quantity': 5, 'reorder_point': 2,
+        }
+        self.assertEqual(self.client.put(url, data, format='json').status_code, 200)
+
+    def test_product_delete(self):
+        self.assertEqual(self.client.delete(f'/api/products/{self.product.pk}/').status_code, 204)
+
+    def test_adjust_stock(self):
+        url = f'/api/products/{self.product.pk}/adjust_stock/'
+        self.assertEqual(self.client.post(url, {'quantity_change': -3}, format='json').status_code, 200)
+
+    def test_adjust_stock_batch(self):
+        lines = [{'product_id': product.pk, 'quantity_change': -1} for product in self.products]
+        response = self.client.post('/api/products/adjust_stock/', {'adjustments': lines}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_category_list(self):
+        self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+
+    def test_supplier_list(self):
+        self.assertEqual(self.client.get('/api/suppliers/').status_code, 200)
+
+    def test_stock_movement_list(self):
+        for params in ({}, {'product': self.product.pk}, {'cursor': ''}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/stock-movements/', params).status_code, 200)
+
+    def test_dashboard_analytics(self):
+        for time_range in ('all', '30'):
+            with self.subTest(range=time_range):
+                self.assertEqual(self.client.get('/api/analytics/', {'range': time_range}).status_code, 200)
+
+    def test_top_products(self):
+        category = self.product.category_id
+        for params in ({}, {'range': 'all'}, {'category': category}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/analytics/top-products/', params).status_code, 200)
+
+    def test_current_user(self):
+        self.assertEqual(self.client.get('/api/user/').status_code, 200)
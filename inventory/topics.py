@@ -0,0 +1,24 @@
+# inventory/topics.py
+
+# Channel-layer groups product updates are published to. Every change goes
+# to ALL_PRODUCTS_GROUP, which clients are in until they subscribe to
+# something narrower, and to the group of its product, of its category and,
+# while at or below its reorder point, to the low-stock feed.
+
+ALL_PRODUCTS_GROUP = 'products_group'
+LOW_STOCK_GROUP = 'products.low_stock'
+
+
+def product_group(product_id):
+    return f'products.product.{product_id}'
+
+
+def category_group(category_id):
+    return f'products.category.{category_id}'
+
+
+def product_groups(product):
+    groups = [ALL_PRODUCTS_GROUP, product_group(product.pk), category_group(product.category_id)]
+    if product.quantity <= product.reorder_point:
+        groups.append(LOW_STOCK_GROUP)
+    return groups
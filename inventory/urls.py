@@ -4,7 +4,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     SupplierViewSet, CategoryViewSet, ProductViewSet, CurrentUserView,
-    DashboardAnalyticsView, StockMovementViewSet
+    DashboardAnalyticsView, StockMovementViewSet, CacheStatsView
 )
 from .views import product_qrcode_view
 from .views import top_selling_products_view
@@ -20,6 +20,7 @@ router.register(r'stock-movements', StockMovementViewSet, basename='stock-moveme
 urlpatterns = [
     path('', include(router.urls)),
     path('user/', CurrentUserView.as_view(), name='current_user'),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache_stats'),
     path('analytics/', DashboardAnalyticsView.as_view(), name='dashboard_analytics'),
     path('products/<int:pk>/qrcode/', product_qrcode_view, name='product-qrcode'),
     path('analytics/top-products/', top_selling_products_view, name='top-products'),
@@ -1,20 +1,21 @@
 # inventory/views.py
 
 from django.db import transaction
-from django.db.models import Sum, F, Count, DecimalField
-from django.db.models.functions import Coalesce, TruncDate
+from django.db.models import Count, Max, Prefetch, Q
 from django.http import JsonResponse, HttpResponse
 from django.contrib.auth.decorators import user_passes_test
 from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.conf import settings
 from django.contrib.auth.models import User
 
 from rest_framework import viewsets, filters, parsers, generics
 from rest_framework.decorators import api_view, action, permission_classes
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
@@ -22,23 +23,49 @@ from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import Supplier, Category, Product, StockMovement, ProductImage
 from .serializers import (
-    SupplierSerializer, CategorySerializer, ProductSerializer, 
+    SupplierSerializer, CategorySerializer, ProductSerializer, ProductCompactSerializer,
     StockMovementSerializer, UserSerializer, RegisterSerializer
 )
-from .tasks import get_sales_forecast
+from .cache import product_cache, analytics_cache, product_qr_data, qr_cache, user_cache
+from .changes import ResyncRequired, changes_since
+from .conditional import ConditionalListMixin, conditional_get, etag_matches, make_etag
+from .export import export_response, streaming_response, PRODUCT_EXPORT_COLUMNS, STOCK_MOVEMENT_EXPORT_COLUMNS
+from .forecasts import queue_forecasts, stale_forecasts
+from .importer import import_products, read_rows, detect_format, open_upload
+from .labels import iter_pdf, render_label_pages
+from .pagination import KeysetPaginationMixin
+from .rollup import SalesWindow
+from .stock import adjust_stock as adjust_product_stock, adjust_stock_batch, InsufficientStock, MAX_BATCH_LINES
+from .search import ProductSearchFilter
 
-import qrcode
-import io
+import csv
 import random
-from faker import Faker
 from datetime import timedelta
-from tqdm import tqdm
+
+PRODUCT_COLUMNS = {field.name for field in Product._meta.concrete_fields}
+
+def split_param(value):
+    return [part.strip() for part in value.split(',') if part.strip()] if value else []
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 1000
 
+class ProductPagination(KeysetPaginationMixin, StandardResultsSetPagination):
+    keyset_orderings = {
+        'id': ('id',),
+        'updated_at': ('-updated_at', '-id'),
+    }
+    default_keyset_ordering = 'id'
+
+class StockMovementPagination(KeysetPaginationMixin, PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    keyset_orderings = {'timestamp': ('-timestamp', '-id')}
+    default_keyset_ordering = 'timestamp'
+
 class SupplierViewSet(viewsets.ModelViewSet):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
@@ -46,55 +73,253 @@ class SupplierViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'contact_info']
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.select_related('category', 'supplier').all()
+    def get_list_etag(self, queryset):
+        state = queryset.order_by().aggregate(last_update=Max('updated_at'), last_id=Max('id'), total=Count('id'))
+        return make_etag('categories', self.request.get_full_path(), *state.values())
+
+    def get_detail_etag(self, pk):
+        try:
+            updated_at = Category.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            return None
+        return make_etag('category', pk, updated_at) if updated_at else None
+
+class ProductViewSet(ConditionalListMixin, viewsets.ModelViewSet):
+    queryset = Product.objects.select_related('category', 'supplier').prefetch_related('images')
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = ProductPagination
     
     parser_classes = [parsers.JSONParser, parsers.MultiPartParser, parsers.FormParser]
 
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    filter_backends = [ProductSearchFilter, DjangoFilterBackend]
     search_fields = ['name', 'sku', 'category__name']
     filterset_fields = {
         'sale_price': ['gt', 'lt'],
         'category': ['exact'], 
     }
 
+    read_actions = ('list', 'retrieve')
+
+    def is_read(self):
+        return self.request is not None and self.request.method == 'GET' and self.action in self.read_actions
+
+    def get_serializer_class(self):
+        if self.is_read() and self.request.query_params.get('view') == 'compact':
+            return ProductCompactSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.is_read():
+            context['fields'] = split_param(self.request.query_params.get('fields'))
+            context['expand'] = split_param(self.request.query_params.get('expand'))
+        return context
+
+    def get_queryset(self):
+        if self.action == 'destroy':
+            return Product.objects.all()
+        if not self.is_read():
+            return super().get_queryset()
+
+        # Only join, prefetch and load what the chosen fields will render.
+        fields = {name for name, field in self.get_serializer().fields.items() if not field.write_only}
+        columns = {'id', 'updated_at'} | (fields & PRODUCT_COLUMNS)
+        queryset = Product.objects.all()
+        if fields & {'category', 'category_name'}:
+            queryset = queryset.select_related('category')
+            columns.add('category')
+        if 'supplier' in fields:
+            queryset = queryset.select_related('supplier')
+            columns.add('supplier')
+        if 'images' in fields:
+            queryset = queryset.prefetch_related('images')
+        elif 'image' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'images', queryset=ProductImage.objects.order_by('id')[:1], to_attr='cover_images'
+            ))
+        return queryset.only(*columns)
+
+    def get_list_etag(self, queryset):
+        state = queryset.order_by().aggregate(last_update=Max('updated_at'), last_id=Max('id'), total=Count('id'))
+        return make_etag('products', self.request.get_full_path(), *state.values())
+
+    def get_detail_etag(self, pk):
+        # The detail payload includes the forecast, so sales and a newly
+        # stored forecast must change it too.
+        try:
+            row = Product.objects.filter(pk=pk).annotate(last_movement=Max('movements__id')) \
+                .values_list('updated_at', 'last_movement', 'stored_forecast__computed_at').first()
+        except (TypeError, ValueError):
+            return None
+        return make_etag('product', pk, *row) if row else None
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        if not queryset.query.order_by:
+            queryset = queryset.order_by('id')
+        return export_response(request, queryset, PRODUCT_EXPORT_COLUMNS, 'products')
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Products changed after ``?cursor=`` (from a websocket frame or an
+        earlier call), optionally only ``?products=1,2`` and/or
+        ``?category=``; filtered products changed out of the filter (moved
+        to another category) are listed in ``left``. 410 Gone with a fresh
+        cursor when the cursor is too old to catch up from; reload the data
+        and resume from it.
+        """
+        try:
+            cursor = int(request.query_params.get('cursor', ''))
+            product_ids = [int(pk) for pk in split_param(request.query_params.get('products'))]
+            category_id = int(request.query_params['category']) if request.query_params.get('category') else None
+        except ValueError:
+            return Response({'error': 'cursor, products and category must be integers'}, status=400)
+
+        products = None
+        if product_ids or category_id is not None:
+            wanted = Q(pk__in=product_ids)
+            if category_id is not None:
+                wanted |= Q(category_id=category_id)
+            products = Product.objects.filter(wanted)
+        try:
+            return Response(changes_since(cursor, products))
+        except ResyncRequired as e:
+            return Response({'resync': True, 'cursor': e.cursor}, status=410)
+
+    @action(detail=False, methods=['get'])
+    def labels(self, request):
+        """
+        A PDF of printable label sheets (24 per A4 page: QR code, name, SKU)
+        for ``?products=1,2`` in that order, or every product of
+        ``?category=``. Pages are rendered on the process's shared label
+        pool (LABEL_MAX_PROCESSES workers) and streamed in order as they
+        finish.
+        """
+        try:
+            product_ids = [int(pk) for pk in split_param(request.query_params.get('products'))]
+            category_id = int(request.query_params['category']) if request.query_params.get('category') else None
+        except ValueError:
+            return Response({'error': 'products and category must be integers'}, status=400)
+        if not product_ids and category_id is None:
+            return Response({'error': 'Pass products or category'}, status=400)
+
+        limit = getattr(settings, 'LABEL_SHEET_MAX_PRODUCTS', 1000)
+        queryset = Product.objects.filter(pk__in=product_ids) if product_ids else Product.objects.filter(category_id=category_id)
+        rows = {pk: (name, sku) for pk, name, sku in queryset.order_by('pk').values_list('pk', 'name', 'sku')[:limit + 1]}
+        if len(rows) > limit:
+            return Response({'error': f'At most {limit} products per label sheet'}, status=400)
+        if not rows:
+            raise NotFound('No such products.')
+
+        order = [pk for pk in dict.fromkeys(product_ids) if pk in rows] if product_ids else list(rows)
+        labels = [(*rows[pk], product_qr_data(pk)) for pk in order]
+        pages = render_label_pages(labels, getattr(settings, 'LABEL_MAX_PROCESSES', 2))
+        response = streaming_response(request, iter_pdf(pages), 'application/pdf')
+        response['Content-Disposition'] = 'attachment; filename="labels.pdf"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_products(self, request):
+        upload = request.FILES.get('file')
+        if upload is not None:
+            file_format = request.query_params.get('input') or detect_format(upload.name)
+            rows = read_rows(open_upload(upload), file_format)
+        elif isinstance(request.data, list):
+            rows = request.data
+        elif isinstance(request.data.get('products'), list):
+            rows = request.data['products']
+        else:
+            return Response({'error': 'Upload a csv/json/ndjson file or send a JSON list of products'}, status=400)
+
+        try:
+            report = import_products(rows, user=request.user)
+        except (ValueError, csv.Error) as e:
+            return Response({'error': f'Could not read import file: {e}'}, status=400)
+        return Response(report.as_dict())
+
+    @action(detail=False, methods=['get', 'post'], url_path='forecast', permission_classes=[IsAdminUser])
+    def forecast_batch(self, request):
+        # Fits run in forecast_worker, never in the web process: the request
+        # only queues them.
+        if request.method == 'GET':
+            return Response({'queued': stale_forecasts().count()})
+        data = request.data if isinstance(request.data, dict) else {}
+        product_ids = data.get('products')
+        if product_ids is not None and not (
+            isinstance(product_ids, list) and all(isinstance(pk, int) for pk in product_ids)
+        ):
+            return Response({'error': 'products must be a list of product ids'}, status=400)
+
+        if product_ids is not None:
+            queued = queue_forecasts(Product.objects.filter(pk__in=product_ids))
+        elif data.get('all'):
+            queued = queue_forecasts(Product.objects.all())
+        else:
+            # Stale forecasts are already queued.
+            queued = stale_forecasts().count()
+        return Response({'queued': queued, 'status': request.build_absolute_uri()}, status=202)
+
     @action(detail=True, methods=['post'])
-    @transaction.atomic
     def adjust_stock(self, request, pk=None):
-        product = self.get_object()
         quantity_change = request.data.get('quantity_change')
         reason = request.data.get('reason', 'Manual adjustment')
         if quantity_change is None: return Response({'error': 'quantity_change is required'}, status=400)
         try: quantity_change = int(quantity_change)
-        except ValueError: return Response({'error': 'quantity_change must be an integer'}, status=400)
-        if product.quantity + quantity_change < 0: return Response({'error': 'Stock cannot go below zero'}, status=400)
-        StockMovement.objects.create(product=product, quantity_change=quantity_change, reason=reason, user=request.user)
-        product.quantity += quantity_change
-        product.save()
-        serializer = self.get_serializer(product)
-        return Response(serializer.data)
+        except (TypeError, ValueError): return Response({'error': 'quantity_change must be an integer'}, status=400)
+        try:
+            product = adjust_product_stock(pk, quantity_change, reason=reason, user=request.user)
+        except (Product.DoesNotExist, ValueError):
+            raise NotFound()
+        except InsufficientStock:
+            return Response({'error': 'Stock cannot go below zero'}, status=400)
+        return Response(self.get_serializer(product).data)
+
+    @action(detail=False, methods=['post'], url_path='adjust_stock')
+    def adjust_stock_batch(self, request):
+        lines = request.data.get('adjustments') if isinstance(request.data, dict) else request.data
+        if not isinstance(lines, list) or not lines:
+            return Response({'error': 'adjustments must be a non-empty list'}, status=400)
+        if len(lines) > MAX_BATCH_LINES:
+            return Response({'error': f'At most {MAX_BATCH_LINES} adjustments per request'}, status=400)
+        mode = request.data.get('mode', 'atomic') if isinstance(request.data, dict) else 'atomic'
+        if mode not in ('atomic', 'partial'):
+            return Response({'error': "mode must be 'atomic' or 'partial'"}, status=400)
+
+        applied_ids, results = adjust_stock_batch(lines, user=request.user, atomic=mode == 'atomic')
+        applied = sum(1 for result in results if result['status'] == 'applied')
+        failed = sum(1 for result in results if result['status'] == 'error')
+        return Response(
+            {'mode': mode, 'applied': applied, 'failed': failed, 'results': results},
+            status=400 if mode == 'atomic' and failed else 200,
+        )
 
 class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = StockMovementSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = StockMovementPagination
 
     def get_queryset(self):
-        queryset = StockMovement.objects.all().order_by('-timestamp')
+        queryset = StockMovement.objects.select_related('user').order_by('-timestamp')
         product_id = self.request.query_params.get('product')
         if product_id is not None:
             queryset = queryset.filter(product_id=product_id)
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None).order_by('-timestamp', '-id')
+        return export_response(request, queryset, STOCK_MOVEMENT_EXPORT_COLUMNS, 'stock-movements')
+
 class CurrentUserView(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
@@ -102,14 +327,12 @@ class CurrentUserView(APIView):
         return Response(serializer.data)
 
 import random
-from faker import Faker
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 from inventory.models import Supplier, Category, Product, StockMovement, ProductImage
 from django.db import transaction
-from tqdm import tqdm
 from django.conf import settings
 from django.db.models.functions import TruncDate
 
@@ -120,46 +343,59 @@ class Command(BaseCommand):
     def handle(self, *args, **kwargs):
         pass
 
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+    def get(self, request):
+        return Response({
+            'products': product_cache.stats(), 'analytics': analytics_cache.stats(), 'users': user_cache.stats(),
+        })
+
+def parse_days(time_range):
+    try:
+        return int(time_range)
+    except (TypeError, ValueError):
+        return None
+
+def sales_since(days):
+    return None if days is None else timezone.now() - timedelta(days=days)
+
+def analytics_watermark(days, category_id=None):
+    # New movements raise the max id; rows leaving a rolling window lower the
+    # window count; product edits (prices, names, stock) move updated_at.
+    last_movement = StockMovement.objects.aggregate(last_id=Max('id'))['last_id']
+    in_window = None
+    if days is not None:
+        sales_movements = StockMovement.objects.filter(quantity_change__lt=0, timestamp__gte=sales_since(days))
+        if category_id:
+            sales_movements = sales_movements.filter(product__category_id=category_id)
+        in_window = sales_movements.count()
+    products = Product.objects.aggregate(last_update=Max('updated_at'), total=Count('id'))
+    return (last_movement, in_window, *products.values())
+
+def cached_analytics_response(request, key, compute_watermark, compute):
+    watermark = compute_watermark()
+    etag = make_etag('analytics', request.get_full_path(), *watermark)
+    if not etag_matches(request, etag):
+        data, watermark, state = analytics_cache.get(key, watermark, compute, compute_watermark)
+        # Validate against what is actually served, which may be the stale copy.
+        etag = make_etag('analytics', request.get_full_path(), *watermark)
+    return conditional_get(request, lambda: etag, lambda: Response(data, headers={'X-Analytics-Cache': state}))
+
 class DashboardAnalyticsView(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        time_range = request.query_params.get('range', 'all')
+        days = parse_days(request.query_params.get('range', 'all'))
+        return cached_analytics_response(
+            request,
+            analytics_cache.key('dashboard', 'all' if days is None else days),
+            lambda: analytics_watermark(days),
+            lambda: self.get_dashboard_data(SalesWindow(sales_since(days))),
+        )
 
-        if time_range == 'all':
-            sales_movements = StockMovement.objects.filter(quantity_change__lt=0)
-        else:
-            try:
-                days = int(time_range)
-                start_date = timezone.now() - timedelta(days=days)
-                sales_movements = StockMovement.objects.filter(
-                    timestamp__gte=start_date,
-                    quantity_change__lt=0
-                )
-            except ValueError:
-                sales_movements = StockMovement.objects.filter(quantity_change__lt=0)
-        
-        sales_trend = sales_movements.annotate(day=TruncDate('timestamp')).values('day').annotate(total_revenue=Sum(F('quantity_change') * F('product__sale_price') * -1, output_field=DecimalField())).order_by('day')
-        top_selling_products = sales_movements.values('product__name').annotate(units_sold=Sum('quantity_change') * -1).order_by('-units_sold')[:5]
-        revenue_by_category = sales_movements.values('product__category__name').annotate(total_revenue=Sum(F('quantity_change') * F('product__sale_price') * -1, output_field=DecimalField())).order_by('-total_revenue')
-
-        category_distribution = sales_movements.values('product__category__name') \
-            .annotate(count=Count('product', distinct=True)) \
-            .order_by('-count')
-
-        total_inventory_value = Product.objects.aggregate(total_value=Coalesce(Sum(F('quantity') * F('sale_price'), output_field=DecimalField()), 0, output_field=DecimalField()))['total_value']
-        total_products = Product.objects.count()
-        low_stock_items = Product.objects.filter(quantity__lte=F('reorder_point')).count()
-        
-        data = {
-            'total_inventory_value': total_inventory_value,
-            'total_products': total_products,
-            'low_stock_items': low_stock_items,
-            'category_distribution': list(category_distribution),
-            'sales_trend': list(sales_trend),
-            'top_selling_products': list(top_selling_products),
-            'revenue_by_category': list(revenue_by_category),
-        }
-        return Response(data)
+    def get_dashboard_data(self, sales):
+        # The NumPy engine loads on the first dashboard request, not at worker boot.
+        from .analytics import get_dashboard_data
+        return get_dashboard_data(sales)
     
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -168,42 +404,32 @@ class RegisterView(generics.CreateAPIView):
     
 @api_view(['GET'])
 def product_qrcode_view(request, pk):
-    try:
-        frontend_url = f"http://localhost:3000/products/{pk}"
-        qr_image = qrcode.make(frontend_url, box_size=10)
-        buffer = io.BytesIO()
-        qr_image.save(buffer, "PNG")
-        buffer.seek(0)
+    if not Product.objects.filter(pk=pk).exists():
+        return Response({'error': 'Product not found'}, status=404)
 
-        return HttpResponse(buffer, content_type="image/png")
+    data = product_qr_data(pk)
+    # The image depends only on what it encodes, so its digest is the ETag.
+    etag = f'"{qr_cache.digest(data)}"'
+    if etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(qr_cache.get(data), content_type="image/png")
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'QR_CODE_MAX_AGE', 30 * 86400))
+    return response
 
-    except Product.DoesNotExist:
-        return Response({'error': 'Product not found'}, status=404)
-    
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def top_selling_products_view(request):
-    time_range = request.query_params.get('range', '30')
+    days = parse_days(request.query_params.get('range', '30'))
     category_id = request.query_params.get('category', None)
 
-    sales_movements = StockMovement.objects.filter(quantity_change__lt=0)
-
-    if time_range != 'all':
-        try:
-            days = int(time_range)
-            start_date = timezone.now() - timedelta(days=days)
-            sales_movements = sales_movements.filter(timestamp__gte=start_date)
-        except ValueError:
-            pass 
-
-    if category_id:
-        sales_movements = sales_movements.filter(product__category_id=category_id)
-
-    top_products = sales_movements.values('product__name') \
-        .annotate(units_sold=Sum('quantity_change') * -1) \
-        .order_by('-units_sold')[:5]
-    
-    return Response(list(top_products))
+    return cached_analytics_response(
+        request,
+        analytics_cache.key('top-products', 'all' if days is None else days, category_id or 'all'),
+        lambda: analytics_watermark(days, category_id),
+        lambda: SalesWindow(sales_since(days), category_id).top_selling_products(),
+    )
 
 def superuser_required(view_func):
     return user_passes_test(lambda u: u.is_superuser, login_url='/')(view_func)
@@ -0,0 +1,53 @@
+# inventory/workers.py
+
+import logging
+import queue
+import threading
+
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    """
+    One daemon thread per process that runs submitted jobs in order. A key
+    already queued is not queued again, so a burst of submissions for the
+    same key costs one run.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._thread = None
+
+    def submit(self, key, job):
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        self._queue.put((key, job))
+        return True
+
+    def _run(self):
+        while True:
+            key, job = self._queue.get()
+            try:
+                job()
+            except Exception:
+                logger.exception('%s: job %s failed', self.name, key)
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                # The worker's connection would otherwise idle until the
+                # database drops it.
+                connection.close()
+                self._queue.task_done()
+
+    def join(self):
+        self._queue.join()